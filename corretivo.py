@@ -29,19 +29,29 @@ Comando: python corretivo.py --errors-file .\errors_<mes>.csv --download-dir "C:
 from __future__ import annotations
 
 import argparse
+import base64
 import csv
+import functools
 import logging
 import os
 import re
 import sys
+import threading
 import time
 import shutil  # <-- ADICIONADO PARA MOVER ARQUIVOS
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 import requests
-from requests.auth import HTTPBasicAuth
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson  # opcional: parse JSON em C
+except ImportError:
+    orjson = None
 
 try:
     import mysql.connector as mysql
@@ -135,6 +145,27 @@ def read_env(env_path: str) -> EnvConfig:
     )
 
 # -------- Freshdesk helpers --------
+_THREAD_LOCAL = threading.local()
+
+def new_session() -> requests.Session:
+    """Session com pool de conexões maior e retentativa automática de falhas de rede/5xx."""
+    sess = requests.Session()
+    retry = Retry(total=5, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504],
+                  allowed_methods=frozenset({"GET", "HEAD"}), raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=64, pool_block=False, max_retries=retry)
+    sess.mount("https://", adapter)
+    sess.mount("http://", adapter)
+    return sess
+
+def thread_session() -> requests.Session:
+    """Uma requests.Session por thread de trabalho (mantém keep-alive sem disputa de pool)."""
+    sess = getattr(_THREAD_LOCAL, "session", None)
+    if sess is None:
+        sess = new_session()
+        _THREAD_LOCAL.session = sess
+    return sess
+
+@functools.lru_cache(maxsize=4)
 def fd_base(subdomain: str) -> str:
     sd = (subdomain or "").strip().rstrip("/")
     if sd and "." not in sd:
@@ -143,51 +174,65 @@ def fd_base(subdomain: str) -> str:
         sd = "https://" + sd
     return sd
 
+@functools.lru_cache(maxsize=4)
+def fd_headers(api_key: str) -> Dict[str, str]:
+    """Cabeçalhos da API com o Basic auth já codificado (calculado uma vez por chave)."""
+    token = base64.b64encode(f"{api_key}:X".encode("utf-8")).decode("ascii")
+    return {"Accept": "application/json", "Authorization": f"Basic {token}"}
+
 def fd_get(subdomain: str, api_key: str, path: str, params: Optional[Dict[str, str]] = None,
            max_retries: int = 5, session: Optional[requests.Session] = None) -> requests.Response:
+    # falhas de rede e 5xx são retentadas pelo HTTPAdapter da sessão; aqui só o 429 (com log)
     url = f"{fd_base(subdomain)}/api/v2{path}"
-    sess = session or requests.Session()
+    sess = session or thread_session()
     attempt = 0
     while True:
-        try:
-            r = sess.get(url, params=params or {}, headers={"Accept": "application/json"},
-                         auth=HTTPBasicAuth(api_key, "X"), timeout=120)
-            if r.status_code == 429:
-                retry_after = r.headers.get("Retry-After")
-                wait = float(retry_after) if retry_after and retry_after.isdigit() else (2 ** attempt)
-                wait = min(wait, 60.0)
-                LOGGER.warning("[429] Rate limit Freshdesk. Aguardando %.1fs...", wait)
-                time.sleep(wait)
-                attempt += 1
-                if attempt > max_retries:
-                    r.raise_for_status()
-                continue
-            r.raise_for_status()
-            return r
-        except requests.RequestException as e:
-            if attempt < max_retries:
-                wait = min(2 ** attempt, 30)
-                LOGGER.warning("[WARN] Falha de rede em %s: %s. Retentando em %ss...", path, e, wait)
-                time.sleep(wait)
-                attempt += 1
-                continue
-            raise
+        r = sess.get(url, params=params or {}, headers=fd_headers(api_key), timeout=120)
+        if r.status_code == 429:
+            retry_after = r.headers.get("Retry-After")
+            wait = float(retry_after) if retry_after and retry_after.isdigit() else (2 ** attempt)
+            wait = min(wait, 60.0)
+            LOGGER.warning("[429] Rate limit Freshdesk. Aguardando %.1fs...", wait)
+            time.sleep(wait)
+            attempt += 1
+            if attempt > max_retries:
+                r.raise_for_status()
+            continue
+        r.raise_for_status()
+        return r
 
 def fd_get_ticket_full(subdomain: str, api_key: str, ticket_id: int, session: Optional[requests.Session]=None) -> dict:
     r = fd_get(subdomain, api_key, f"/tickets/{ticket_id}", params={"include": "conversations"}, session=session)
+    if orjson is not None:
+        return orjson.loads(r.content)
     return r.json()
 
 # -------- Download de anexos --------
-ATT_NAME_SIG_RE = re.compile(r"(logo|assinatura|signature|rodape|footer|image0+\d|facebook|instagram|linkedin|twitter|whatsapp)", re.I)
+# nomes típicos de assinatura/logo: substrings fixas + um único padrão (image001.png etc.)
+ATT_NAME_SIG_TOKENS = ("logo", "assinatura", "signature", "rodape", "footer",
+                       "facebook", "instagram", "linkedin", "twitter", "whatsapp")
+ATT_NAME_IMG0_RE = re.compile(r"image0+\d")
+
+def is_signature_like(fn: str) -> bool:
+    fnl = fn.lower()
+    return any(tok in fnl for tok in ATT_NAME_SIG_TOKENS) or ATT_NAME_IMG0_RE.search(fnl) is not None
+
+# caracteres proibidos em nomes de arquivo (Windows) + controles ASCII -> "_"
+_SAFE_FILENAME_TABLE = str.maketrans({c: "_" for c in '<>:"/\\|?*' + "".join(map(chr, range(0x20)))})
 
 def safe_filename(name: str) -> str:
-    return re.sub(r'[<>:"/\\|?*\x00-\x1F]', "_", name)[:180]
+    return name.translate(_SAFE_FILENAME_TABLE)[:180]
 
 def ensure_dir(p: Path):
     p.mkdir(parents=True, exist_ok=True)
 
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
 def download_binary(url: str, dest: Path, min_bytes: int, session: Optional[requests.Session]=None) -> Tuple[bool, int]:
-    sess = session or requests.Session()
+    sess = session or thread_session()
+    # grava em .part e só troca pelo destino no sucesso: uma falha não apaga um
+    # arquivo bom já baixado numa execução anterior
+    part = dest.with_name(dest.name + ".part")
     try:
         with sess.get(url, timeout=120, stream=True) as rr:
             rr.raise_for_status()
@@ -196,37 +241,57 @@ def download_binary(url: str, dest: Path, min_bytes: int, session: Optional[requ
                 LOGGER.info("[INFO] Ignorado anexo muito pequeno (%d B): %s", size, url)
                 return False, size
             ensure_dir(dest.parent)
-            with open(dest, "wb") as f:
-                for chunk in rr.iter_content(chunk_size=8192):
+            # blocos de 1 MiB; iter_content converte erros do urllib3 (conexão cortada,
+            # corpo truncado) em exceções do requests
+            written = 0
+            with open(part, "wb") as f:
+                for chunk in rr.iter_content(DOWNLOAD_CHUNK_SIZE):
                     f.write(chunk)
-            return True, size
+                    written += len(chunk)
+            os.replace(part, dest)
+            return True, size or written
     except requests.RequestException as e:
+        # não deixa arquivo parcial para trás
+        part.unlink(missing_ok=True)
         LOGGER.warning("[WARNING] Falha ao baixar %s: %s", url, e)
         return False, 0
 
 def collect_and_download_attachments(ticket: dict, ticket_dir: Path, min_kb: int,
                                      block_signature_like: bool = True,
-                                     session: Optional[requests.Session]=None) -> int:
+                                     session: Optional[requests.Session]=None,
+                                     executor: Optional[ThreadPoolExecutor]=None) -> int:
     saved = 0
     min_bytes = max(0, min_kb) * 1024
+    # nome -> url; nomes repetidos no mesmo ticket gravariam o mesmo arquivo (vale o último)
+    jobs: Dict[str, str] = {}
 
     def handle_one(name: str, url: str):
-        nonlocal saved
         if not url: return
         fn = safe_filename(name or url.split("/")[-1].split("?")[0] or "attachment")
-        if block_signature_like and ATT_NAME_SIG_RE.search(fn):
+        if block_signature_like and is_signature_like(fn):
             LOGGER.info("[INFO] Pulado provável assinatura/logo: %s", fn)
             return
-        ok, size = download_binary(url, ticket_dir / fn, min_bytes, session=session)
-        if ok:
-            saved += 1
-            LOGGER.info("[INFO] Anexo salvo (%d B): %s", size, fn)
+        jobs[fn] = url
 
     for a in (ticket.get("attachments") or []):
         handle_one(a.get("name"), a.get("attachment_url"))
     for c in (ticket.get("conversations") or []):
         for a in (c.get("attachments") or []):
             handle_one(a.get("name"), a.get("attachment_url"))
+
+    if executor is None:
+        results = ((fn, download_binary(url, ticket_dir / fn, min_bytes, session=session))
+                   for fn, url in jobs.items())
+    else:
+        # cada thread do pool usa a própria Session (thread_session)
+        futures = {executor.submit(download_binary, url, ticket_dir / fn, min_bytes): fn
+                   for fn, url in jobs.items()}
+        results = ((futures[fut], fut.result()) for fut in as_completed(futures))
+
+    for fn, (ok, size) in results:
+        if ok:
+            saved += 1
+            LOGGER.info("[INFO] Anexo salvo (%d B): %s", size, fn)
     return saved
 
 # -------- Planilha de mapeamento --------
@@ -235,34 +300,44 @@ class Mapping:
     contact_by_fd_id: Dict[int, str]
     org_by_fd_id: Dict[int, str]
 
+def _read_mapping_sheet(ws, id_headers: Tuple[str, ...], octa_headers: Tuple[str, ...]) -> Dict[int, str]:
+    out: Dict[int, str] = {}
+    rows = ws.iter_rows(values_only=True)
+    first = next(rows, None)
+    if first is None:
+        return out
+    headers = {str(v).strip().lower(): idx for idx, v in enumerate(first)}
+    col_id = next((headers[h] for h in headers if h in id_headers), 0)
+    col_octa = next((headers[h] for h in headers if h in octa_headers), 1)
+    for row in rows:
+        try:
+            v_id = row[col_id]
+            v_octa = row[col_octa]
+        except IndexError: continue
+        # em read_only o openpyxl já entrega int/str/None: só cai no str().strip() quando precisa
+        if type(v_id) is int:
+            fdid = v_id
+        else:
+            try: fdid = int(v_id.strip() if isinstance(v_id, str) else str(v_id).strip())
+            except (ValueError, TypeError): continue
+        octa = v_octa.strip() if isinstance(v_octa, str) else str(v_octa).strip()
+        if fdid and octa: out[fdid] = octa
+    return out
+
 def load_mapping(xlsx_path: str) -> Mapping:
+    # read_only + values_only: lê a planilha em streaming, sem criar objetos de célula
     wb = load_workbook(xlsx_path, read_only=True, data_only=True)
-    contacts_map: Dict[int, str] = {}
-    if "Contatos" in wb.sheetnames:
-        ws = wb["Contatos"]
-        headers = {str(cell.value).strip().lower(): idx for idx, cell in enumerate(ws[1])}
-        col_id = next((headers[h] for h in headers if h in ("id_contato", "freshdesk_id")), 0)
-        col_octa = next((headers[h] for h in headers if h in ("octa id", "octa_id")), 1)
-        for row in ws.iter_rows(min_row=2):
-            try:
-                fdid = int(str(row[col_id].value).strip())
-                octa = str(row[col_octa].value).strip()
-                if fdid and octa: contacts_map[fdid] = octa
-            except (ValueError, TypeError): continue
-    
-    org_map: Dict[int, str] = {}
-    ws_name = next((s for s in wb.sheetnames if s.lower() in ("organizações", "organizacoes")), None)
-    if ws_name:
-        ws = wb[ws_name]
-        headers = {str(cell.value).strip().lower(): idx for idx, cell in enumerate(ws[1])}
-        col_id = next((headers[h] for h in headers if h in ("org_id", "fresh_company_id")), 0)
-        col_octa = next((headers[h] for h in headers if h in ("octa id", "octa_id")), 1)
-        for row in ws.iter_rows(min_row=2):
-            try:
-                fdid = int(str(row[col_id].value).strip())
-                octa = str(row[col_octa].value).strip()
-                if fdid and octa: org_map[fdid] = octa
-            except (ValueError, TypeError): continue
+    try:
+        contacts_map: Dict[int, str] = {}
+        if "Contatos" in wb.sheetnames:
+            contacts_map = _read_mapping_sheet(wb["Contatos"], ("id_contato", "freshdesk_id"), ("octa id", "octa_id"))
+
+        org_map: Dict[int, str] = {}
+        ws_name = next((s for s in wb.sheetnames if s.lower() in ("organizações", "organizacoes")), None)
+        if ws_name:
+            org_map = _read_mapping_sheet(wb[ws_name], ("org_id", "fresh_company_id"), ("octa id", "octa_id"))
+    finally:
+        wb.close()
 
     return Mapping(contact_by_fd_id=contacts_map, org_by_fd_id=org_map)
 
@@ -274,6 +349,57 @@ def mysql_connect(cfg: EnvConfig):
         charset="utf8mb4", use_unicode=True, autocommit=False
     )
 
+MAPPING_CHUNK_SIZE = 500
+
+def _chunks(items: List, size: int) -> Iterable[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+@functools.lru_cache(maxsize=128)
+def _mapping_sql(table: str, pk_col: str, octa_col: str, n: int) -> Tuple[str, str]:
+    """SELECT/UPDATE de um lote com n ids; todos os lotes cheios reaproveitam o mesmo texto."""
+    in_ph = ",".join(["%s"] * n)
+    case_sql = " ".join(["WHEN %s THEN %s"] * n)
+    select_sql = f"SELECT `{pk_col}`, `{octa_col}` FROM `{table}` WHERE `{pk_col}` IN ({in_ph}) FOR UPDATE"
+    update_sql = (f"UPDATE `{table}` SET `{octa_col}` = CASE `{pk_col}` {case_sql} ELSE `{octa_col}` END "
+                  f"WHERE `{pk_col}` IN ({in_ph})")
+    return select_sql, update_sql
+
+def _apply_mapping_chunk(c, table: str, pk_col: str, octa_col: str,
+                         chunk: List[Tuple[int, str]]) -> Tuple[int, Dict[int, str]]:
+    """Classifica cada linha do lote e atualiza só as divergentes com um único UPDATE ... CASE WHEN.
+       SELECT (com FOR UPDATE) e UPDATE rodam na mesma transação; o commit é do chamador.
+       Retorna (linhas atualizadas, {freshdesk_id: status}).
+    """
+    select_sql, update_sql = _mapping_sql(table, pk_col, octa_col, len(chunk))
+    ids = [fdid for fdid, _ in chunk]
+    c.execute(select_sql, ids)
+    current = {int(pk): val for pk, val in c.fetchall()}
+
+    status: Dict[int, str] = {}
+    for fdid, octa in chunk:
+        if fdid not in current:
+            status[fdid] = "inexistente"
+        elif current[fdid] is not None and str(current[fdid]) == octa:
+            status[fdid] = "ja_igual"
+        else:
+            status[fdid] = "atualizado"
+
+    # só entram no UPDATE as linhas cujo valor atual difere do mapeamento; a comparação
+    # em Python é a única fonte da verdade (o UPDATE não refiltra com regras do MySQL),
+    # então relatório e contagem batem
+    to_update = [(fdid, octa) for fdid, octa in chunk if status[fdid] == "atualizado"]
+    if not to_update:
+        return 0, status
+    if len(to_update) != len(chunk):
+        _, update_sql = _mapping_sql(table, pk_col, octa_col, len(to_update))
+
+    case_params: List = []
+    for fdid, octa in to_update:
+        case_params.extend((fdid, octa))
+    c.execute(update_sql, case_params + [fdid for fdid, _ in to_update])
+    return len(to_update), status
+
 def apply_mappings(conn, cfg: EnvConfig, mapping: Mapping, report: Optional[Path] = None) -> Tuple[int, int]:
     c = conn.cursor()
     contacts_updated, orgs_updated = 0, 0
@@ -281,60 +407,59 @@ def apply_mappings(conn, cfg: EnvConfig, mapping: Mapping, report: Optional[Path
     repw = None
     if report:
         ensure_dir(report.parent)
-        repw = open(report, "w", encoding="utf-8", newline="")
+        repw = open(report, "w", encoding="utf-8", newline="", buffering=1 << 20)
         writer = csv.writer(repw)
         writer.writerow(["tipo", "freshdesk_id", "octa_id", "status"])
+    # linhas do relatório acumuladas e gravadas de uma vez no final
+    report_rows: List[List] = []
 
-    sql_contacts = (f"UPDATE `{cfg.table_contacts}` SET `{cfg.contacts_octa_id_field}` = %s "
-                    f"WHERE `{cfg.db_col_contact_pk}` = %s AND NOT (`{cfg.contacts_octa_id_field}` <=> %s)")
-    sql_companies = (f"UPDATE `{cfg.table_companies}` SET `{cfg.companies_octa_id_field}` = %s "
-                     f"WHERE `{cfg.db_col_company_pk}` = %s AND NOT (`{cfg.companies_octa_id_field}` <=> %s)")
-
-    def _exists(table: str, col: str, fdid: int) -> bool:
-        c.execute(f"SELECT 1 FROM `{table}` WHERE `{col}`=%s LIMIT 1", (fdid,))
-        return bool(c.fetchone())
-
-    for fdid, octa in mapping.contact_by_fd_id.items():
+    # ids inexistentes saem do SELECT ... FOR UPDATE do próprio lote (não entram no UPDATE)
+    for chunk in _chunks(list(mapping.contact_by_fd_id.items()), MAPPING_CHUNK_SIZE):
         try:
-            c.execute(sql_contacts, (octa, fdid, octa))
-            if c.rowcount > 0:
-                contacts_updated += c.rowcount
-                LOGGER.info("[INFO] Contato %s atualizado para %s.", fdid, octa)
-                if writer: writer.writerow(["contato", fdid, octa, "atualizado"])
-            else:
-                if _exists(cfg.table_contacts, cfg.db_col_contact_pk, fdid):
-                    LOGGER.info("[INFO] Contato %s já estava com o Octa ID correto.", fdid)
-                    if writer: writer.writerow(["contato", fdid, octa, "ja_igual"])
-                else:
-                    LOGGER.warning("[WARNING] Contato não encontrado p/ update: WHERE %s=%s na tabela %s",
-                                   cfg.db_col_contact_pk, fdid, cfg.table_contacts)
-                    if writer: writer.writerow(["contato", fdid, octa, "inexistente"])
+            updated, status = _apply_mapping_chunk(c, cfg.table_contacts, cfg.db_col_contact_pk,
+                                                   cfg.contacts_octa_id_field, chunk)
             conn.commit()
         except Exception as e:
             conn.rollback()
-            LOGGER.error("[ERROR] Falha ao atualizar contato %s -> %s: %s", fdid, octa, e)
+            LOGGER.error("[ERROR] Falha ao atualizar lote de %d contatos (%s..%s): %s",
+                         len(chunk), chunk[0][0], chunk[-1][0], e)
+            continue
+        contacts_updated += updated
+        for fdid, octa in chunk:
+            st = status[fdid]
+            if st == "atualizado":
+                LOGGER.info("[INFO] Contato %s atualizado para %s.", fdid, octa)
+            elif st == "ja_igual":
+                LOGGER.info("[INFO] Contato %s já estava com o Octa ID correto.", fdid)
+            else:
+                LOGGER.warning("[WARNING] Contato não encontrado p/ update: WHERE %s=%s na tabela %s",
+                               cfg.db_col_contact_pk, fdid, cfg.table_contacts)
+            if writer: report_rows.append(["contato", fdid, octa, st])
 
-    for fdid, octa in mapping.org_by_fd_id.items():
+    for chunk in _chunks(list(mapping.org_by_fd_id.items()), MAPPING_CHUNK_SIZE):
         try:
-            c.execute(sql_companies, (octa, fdid, octa))
-            if c.rowcount > 0:
-                orgs_updated += c.rowcount
-                LOGGER.info("[INFO] Organização %s atualizada para %s.", fdid, octa)
-                if writer: writer.writerow(["organizacao", fdid, octa, "atualizado"])
-            else:
-                if _exists(cfg.table_companies, cfg.db_col_company_pk, fdid):
-                    LOGGER.info("[INFO] Organização %s já estava com o Octa ID correto.", fdid)
-                    if writer: writer.writerow(["organizacao", fdid, octa, "ja_igual"])
-                else:
-                    LOGGER.warning("[WARNING] Empresa não encontrada p/ update: WHERE %s=%s na tabela %s",
-                                   cfg.db_col_company_pk, fdid, cfg.table_companies)
-                    if writer: writer.writerow(["organizacao", fdid, octa, "inexistente"])
+            updated, status = _apply_mapping_chunk(c, cfg.table_companies, cfg.db_col_company_pk,
+                                                   cfg.companies_octa_id_field, chunk)
             conn.commit()
         except Exception as e:
             conn.rollback()
-            LOGGER.error("[ERROR] Falha ao atualizar organização %s -> %s: %s", fdid, octa, e)
+            LOGGER.error("[ERROR] Falha ao atualizar lote de %d organizações (%s..%s): %s",
+                         len(chunk), chunk[0][0], chunk[-1][0], e)
+            continue
+        orgs_updated += updated
+        for fdid, octa in chunk:
+            st = status[fdid]
+            if st == "atualizado":
+                LOGGER.info("[INFO] Organização %s atualizada para %s.", fdid, octa)
+            elif st == "ja_igual":
+                LOGGER.info("[INFO] Organização %s já estava com o Octa ID correto.", fdid)
+            else:
+                LOGGER.warning("[WARNING] Empresa não encontrada p/ update: WHERE %s=%s na tabela %s",
+                               cfg.db_col_company_pk, fdid, cfg.table_companies)
+            if writer: report_rows.append(["organizacao", fdid, octa, st])
 
     if repw:
+        writer.writerows(report_rows)
         repw.close()
         LOGGER.info("[INFO] Relatório de reconciliação salvo em: %s", str(report))
     c.close()
@@ -346,6 +471,7 @@ def parse_error_data_from_csv(path: str) -> Tuple[List[int], Set[int], Set[int]]
        Retorna uma tupla com: (lista de ticket_ids, conjunto de contact_ids, conjunto de company_ids)
     """
     ticket_ids: List[int] = []
+    seen_tickets: Set[int] = set()
     contact_ids: Set[int] = set()
     company_ids: Set[int] = set()
 
@@ -353,66 +479,92 @@ def parse_error_data_from_csv(path: str) -> Tuple[List[int], Set[int], Set[int]]
     probable_contact_cols = {"contact_fresh_id", "contact_id", "id_contato"}
     probable_company_cols = {"company_fresh_id", "company_id", "org_id", "company_name"}
 
-    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+    # buffer de 1 MiB: o parser C do módulo csv passa a ler o arquivo em poucos blocos grandes
+    with open(path, "r", encoding="utf-8-sig", newline="", buffering=1 << 20) as f:
         reader = csv.reader(f)
-        rows = list(reader)
-    if not rows:
-        return [], set(), set()
-
-    header = [h.strip().lower() for h in rows[0]]
-    idx_map = {h: i for i, h in enumerate(header)}
-
-    ticket_col_idx = next((idx_map[h] for h in header if h in probable_ticket_cols), None)
-    contact_col_idx = next((idx_map[h] for h in header if h in probable_contact_cols), None)
-    company_col_idx = next((idx_map[h] for h in header if h in probable_company_cols), None)
-
-    if ticket_col_idx is None:
-        raise ValueError("Coluna de 'ticket_id' não encontrada no CSV de erros.")
-
-    for r in rows[1:]:
-        if ticket_col_idx < len(r) and r[ticket_col_idx].strip().isdigit():
-            ticket_ids.append(int(r[ticket_col_idx].strip()))
-        
-        if contact_col_idx is not None and contact_col_idx < len(r) and r[contact_col_idx].strip().isdigit():
-            contact_ids.add(int(r[contact_col_idx].strip()))
-
-        if company_col_idx is not None and company_col_idx < len(r) and r[company_col_idx].strip().isdigit():
-            company_ids.add(int(r[company_col_idx].strip()))
-
-    seen_tickets = set()
-    unique_ticket_ids = [i for i in ticket_ids if not (i in seen_tickets or seen_tickets.add(i))]
-
-    return unique_ticket_ids, contact_ids, company_ids
+        first = next(reader, None)
+        if not first:
+            return [], set(), set()
+
+        header = [h.strip().lower() for h in first]
+        idx_map = {h: i for i, h in enumerate(header)}
+
+        ticket_col_idx = next((idx_map[h] for h in header if h in probable_ticket_cols), None)
+        contact_col_idx = next((idx_map[h] for h in header if h in probable_contact_cols), None)
+        company_col_idx = next((idx_map[h] for h in header if h in probable_company_cols), None)
+
+        if ticket_col_idx is None:
+            raise ValueError("Coluna de 'ticket_id' não encontrada no CSV de erros.")
+
+        # passada única: dedupe de tickets feito na leitura, sem materializar o arquivo
+        for r in reader:
+            if ticket_col_idx < len(r):
+                v = r[ticket_col_idx].strip()
+                if v.isdigit():
+                    tid = int(v)
+                    if tid not in seen_tickets:
+                        seen_tickets.add(tid)
+                        ticket_ids.append(tid)
+
+            if contact_col_idx is not None and contact_col_idx < len(r):
+                v = r[contact_col_idx].strip()
+                if v.isdigit():
+                    contact_ids.add(int(v))
+
+            if company_col_idx is not None and company_col_idx < len(r):
+                v = r[company_col_idx].strip()
+                if v.isdigit():
+                    company_ids.add(int(v))
+
+    return ticket_ids, contact_ids, company_ids
+
+def process_one_ticket(tid: int, cfg: EnvConfig, download_dir: str, min_attach_kb: int,
+                       state_dir: Path, block_signature_like: bool, logger: logging.Logger,
+                       attach_executor: Optional[ThreadPoolExecutor] = None) -> int:
+    sess = thread_session()
+    full = fd_get_ticket_full(cfg.fd_subdomain, cfg.fd_api_key, tid, session=sess)
+    tdir = Path(download_dir) / str(tid)
+    ensure_dir(tdir)
+    saved = collect_and_download_attachments(full, tdir, min_attach_kb, block_signature_like,
+                                             session=sess, executor=attach_executor)
+    logger.info("[INFO] Ticket %s: %d anexos salvos.", tid, saved)
+    ensure_dir(state_dir)
+    (state_dir / f"ticket_{tid}.done").touch()
+    return saved
 
 def process_tickets(tickets: List[int], cfg: EnvConfig, download_dir: str,
                     min_attach_kb: int, batch_size: int, state_dir: Path,
-                    block_signature_like: bool, logger: logging.Logger) -> Tuple[int, int]:
-    sess = requests.Session()
+                    block_signature_like: bool, logger: logging.Logger,
+                    workers: int = 8, attach_workers: int = 16) -> Tuple[int, int]:
     processed, saved_total = 0, 0
-
-    for i in range(0, len(tickets), batch_size):
-        batch = tickets[i:i+batch_size]
-        logger.info("[INFO] Lote de %d tickets (%d-%d)", len(batch), i+1, i+len(batch))
-        for tid in batch:
-            marker = state_dir / f"ticket_{tid}.done"
-            if marker.exists():
-                logger.info("[INFO] Ticket %s já marcado como concluído. Pulando download.", tid)
-                processed += 1
-                continue
-            try:
-                full = fd_get_ticket_full(cfg.fd_subdomain, cfg.fd_api_key, tid, session=sess)
-                tdir = Path(download_dir) / str(tid)
-                ensure_dir(tdir)
-                saved = collect_and_download_attachments(full, tdir, min_attach_kb, block_signature_like, session=sess)
-                saved_total += saved
-                logger.info("[INFO] Ticket %s: %d anexos salvos.", tid, saved)
-                ensure_dir(state_dir)
-                marker.touch()
-                processed += 1
-            except requests.HTTPError as he:
-                logger.error("[ERROR] Falha ao buscar ticket %s (HTTP %s)", tid, he.response.status_code if he.response else "?")
-            except Exception as e:
-                logger.error("[ERROR] Falha inesperada ao processar ticket %s: %s", tid, e)
+    # um único scandir do .state no lugar de um stat() por ticket
+    done_set = {e.name for e in os.scandir(state_dir)} if state_dir.exists() else set()
+
+    # pools separados: as threads de ticket aguardam os downloads sem risco de deadlock
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor, \
+         ThreadPoolExecutor(max_workers=max(1, attach_workers)) as attach_executor:
+        for i in range(0, len(tickets), batch_size):
+            batch = tickets[i:i+batch_size]
+            logger.info("[INFO] Lote de %d tickets (%d-%d)", len(batch), i+1, i+len(batch))
+            futures = {}
+            for tid in batch:
+                if f"ticket_{tid}.done" in done_set:
+                    logger.info("[INFO] Ticket %s já marcado como concluído. Pulando download.", tid)
+                    processed += 1
+                    continue
+                fut = executor.submit(process_one_ticket, tid, cfg, download_dir, min_attach_kb,
+                                      state_dir, block_signature_like, logger, attach_executor)
+                futures[fut] = tid
+            for fut in as_completed(futures):
+                tid = futures[fut]
+                try:
+                    saved_total += fut.result()
+                    processed += 1
+                    done_set.add(f"ticket_{tid}.done")
+                except requests.HTTPError as he:
+                    logger.error("[ERROR] Falha ao buscar ticket %s (HTTP %s)", tid, he.response.status_code if he.response else "?")
+                except Exception as e:
+                    logger.error("[ERROR] Falha inesperada ao processar ticket %s: %s", tid, e)
 
     return processed, saved_total
 
@@ -423,6 +575,8 @@ def build_arg_parser() -> argparse.ArgumentParser:
     p.add_argument("--download-dir", required=True, help="Pasta base dos anexos")
     p.add_argument("--min-attach-kb", type=int, default=5, help="Tamanho mínimo de anexo para salvar (kB)")
     p.add_argument("--batch-size", type=int, default=50, help="Quantidade de tickets por lote")
+    p.add_argument("--workers", type=int, default=8, help="Tickets processados em paralelo (requisições simultâneas ao Freshdesk)")
+    p.add_argument("--attach-workers", type=int, default=16, help="Downloads de anexos simultâneos")
     p.add_argument("--mapping-file", default="octadesk_data.xlsx", help="Planilha com mapeamento")
     p.add_argument("--log-file", default=None, help="Caminho do arquivo de log")
     p.add_argument("--env-file", default=".env", help="Caminho do arquivo .env")
@@ -455,8 +609,10 @@ def main():
         logger.error("Falha ao carregar --mapping-file: %s", e)
         sys.exit(2)
         
-    filtered_contact_map = {fd_id: octa_id for fd_id, octa_id in full_mapping.contact_by_fd_id.items() if fd_id in contact_ids_error}
-    filtered_org_map = {fd_id: octa_id for fd_id, octa_id in full_mapping.org_by_fd_id.items() if fd_id in company_ids_error}
+    # itera só a interseção (o lado menor) em vez da planilha inteira
+    contacts_all, orgs_all = full_mapping.contact_by_fd_id, full_mapping.org_by_fd_id
+    filtered_contact_map = {fd_id: contacts_all[fd_id] for fd_id in contacts_all.keys() & contact_ids_error}
+    filtered_org_map = {fd_id: orgs_all[fd_id] for fd_id in orgs_all.keys() & company_ids_error}
     filtered_mapping = Mapping(contact_by_fd_id=filtered_contact_map, org_by_fd_id=filtered_org_map)
     
     logger.info("Mapeamentos filtrados para atualização: %d contatos, %d organizações.",
@@ -485,7 +641,8 @@ def main():
 
         processed, saved = process_tickets(
             ticket_ids, cfg, args.download_dir, args.min_attach_kb,
-            args.batch_size, state_dir, not args.no_attach_signature_block, logger
+            args.batch_size, state_dir, not args.no_attach_signature_block, logger,
+            workers=args.workers, attach_workers=args.attach_workers,
         )
         logger.info("Processamento de tickets concluído. Tickets processados: %d | Anexos salvos: %d", processed, saved)
 
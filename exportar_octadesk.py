@@ -1,6 +1,8 @@
 import os
 import json
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 from openpyxl import Workbook
 import logging
@@ -32,84 +34,111 @@ session.headers.update({
     "Content-Type": "application/json",
 })
 
-def get_paged_data(endpoint_url):
+PAGE_LIMIT = 100
+PAGE_FETCH_WORKERS = 16
+
+# pool do tamanho do fan-out para reaproveitar conexões entre as threads
+session.mount("https://", HTTPAdapter(pool_maxsize=PAGE_FETCH_WORKERS))
+
+def fetch_page(endpoint_url, page):
+    """
+    Busca uma única página de um endpoint da Octadesk.
     """
-    Busca dados de um endpoint da Octadesk com paginação.
+    # Mantendo o limite de 100 por página, que é um padrão seguro
+    response = session.get(f"{endpoint_url}?page={page}&limit={PAGE_LIMIT}")
+    response.raise_for_status()
+    data = response.json()
+    return data if isinstance(data, list) else data.get("items", []) or data.get("data", [])
+
+def iter_paged_data(endpoint_url):
+    """
+    Percorre um endpoint da Octadesk com paginação, entregando os itens
+    página a página (em ordem), sem acumular o resultado inteiro.
+    A página 1 é buscada sozinha; se vier cheia, as seguintes são buscadas
+    em ondas de PAGE_FETCH_WORKERS páginas simultâneas.
     """
     page = 1
-    all_items = []
-    while True:
-        try:
-            # Mantendo o limite de 100 por página, que é um padrão seguro
-            response = session.get(f"{endpoint_url}?page={page}&limit=100")
-            response.raise_for_status()
-            data = response.json()
-            
-            items = data if isinstance(data, list) else data.get("items", []) or data.get("data", [])
-
-            if not items:
+    wave = 1
+    page_size = None
+    with ThreadPoolExecutor(max_workers=PAGE_FETCH_WORKERS) as executor:
+        while True:
+            futures = [(p, executor.submit(fetch_page, endpoint_url, p)) for p in range(page, page + wave)]
+            finished = False
+            for p, fut in futures:
+                if finished:
+                    fut.cancel()
+                    continue
+                try:
+                    items = fut.result()
+                except requests.exceptions.RequestException as e:
+                    logging.error(f"Erro ao buscar dados de {endpoint_url} na página {p}: {e}")
+                    finished = True
+                    continue
+
+                if not items:
+                    finished = True
+                    continue
+
+                yield from items
+                logging.info(f"Buscando página {p} de {endpoint_url.split('/')[-1]}... {len(items)} itens encontrados.")
+                # o tamanho da página 1 é o limite efetivo da API; página menor = última
+                if page_size is None:
+                    page_size = len(items)
+                elif len(items) < page_size:
+                    finished = True
+
+            if finished:
                 break
-            
-            all_items.extend(items)
-            logging.info(f"Buscando página {page} de {endpoint_url.split('/')[-1]}... {len(items)} itens encontrados.")
-            page += 1
-            
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Erro ao buscar dados de {endpoint_url} na página {page}: {e}")
-            break
-            
-    return all_items
+            page += wave
+            # só vale especular páginas em paralelo se a API devolveu a página cheia
+            wave = PAGE_FETCH_WORKERS if page_size and page_size >= PAGE_LIMIT else 1
 
 def get_custom_field_value(custom_fields, field_key_to_find):
     """
-    Extrai o valor de um campo personalizado da lista, buscando pela 'key'.
+    Extrai o valor de um campo personalizado da lista, buscando pela 'key'
+    (para no primeiro campo encontrado).
     """
     if not isinstance(custom_fields, list):
         return ""
-        
-    for field in custom_fields:
-        if isinstance(field, dict) and field.get("key") == field_key_to_find:
-            return field.get("value", "")
-                
-    return ""
+    return next((f.get("value", "") for f in custom_fields
+                 if isinstance(f, dict) and f.get("key") == field_key_to_find), "")
 
 def export_to_xlsx():
     """
     Busca contatos e organizações e os exporta para um arquivo .xlsx.
+    Cada página recebida da API é gravada direto na planilha.
     """
-    logging.info("Iniciando a busca por contatos...")
-    contacts = get_paged_data(f"{OCTADESK_BASE_URL}/contacts")
-    logging.info(f"Total de {len(contacts)} contatos encontrados.")
-
-    logging.info("Iniciando a busca por organizações...")
-    organizations = get_paged_data(f"{OCTADESK_BASE_URL}/organizations")
-    logging.info(f"Total de {len(organizations)} organizações encontradas.")
-
     # --- Criação do Workbook e Planilhas ---
-    wb = Workbook()
-    
+    # write_only: as linhas são serializadas direto, sem manter células em memória
+    wb = Workbook(write_only=True)
+
     # Planilha de Contatos
-    ws_contacts = wb.active
-    ws_contacts.title = "Contatos"
+    ws_contacts = wb.create_sheet("Contatos")
     ws_contacts.append(["Octa ID", "Nome", "id_contato"]) # Adicionada nova coluna
 
-    for contact in contacts:
+    logging.info("Iniciando a busca por contatos...")
+    total_contacts = 0
+    for contact in iter_paged_data(f"{OCTADESK_BASE_URL}/contacts"):
         octa_id = contact.get("id", "N/A") # Extrai o ID principal do contato
         contact_name = contact.get("name", "N/A")
-        custom_fields = contact.get("customFields", [])
-        contact_id_fresh = get_custom_field_value(custom_fields, CONTACT_CUSTOM_FIELD_KEY)
+        contact_id_fresh = get_custom_field_value(contact.get("customFields", []), CONTACT_CUSTOM_FIELD_KEY)
         ws_contacts.append([octa_id, contact_name, contact_id_fresh])
+        total_contacts += 1
+    logging.info(f"Total de {total_contacts} contatos encontrados.")
 
     # Planilha de Organizações
     ws_orgs = wb.create_sheet("Organizações")
     ws_orgs.append(["Octa ID", "Nome", "org_id"]) # Adicionada nova coluna
 
-    for org in organizations:
+    logging.info("Iniciando a busca por organizações...")
+    total_orgs = 0
+    for org in iter_paged_data(f"{OCTADESK_BASE_URL}/organizations"):
         octa_id = org.get("id", "N/A") # Extrai o ID principal da organização
         org_name = org.get("name", "N/A")
-        custom_fields = org.get("customFields", [])
-        org_id_fresh = get_custom_field_value(custom_fields, ORG_CUSTOM_FIELD_KEY)
+        org_id_fresh = get_custom_field_value(org.get("customFields", []), ORG_CUSTOM_FIELD_KEY)
         ws_orgs.append([octa_id, org_name, org_id_fresh])
+        total_orgs += 1
+    logging.info(f"Total de {total_orgs} organizações encontradas.")
 
     # --- Salvar o arquivo ---
     output_filename = "octadesk_data.xlsx"
@@ -4,8 +4,16 @@ import sys
 import json
 import csv
 import argparse
+import base64
+import contextlib
+import functools
 import re
-from typing import Any, Dict, List, Optional, Tuple
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from html import unescape
 from datetime import datetime, timezone
 from pathlib import Path
@@ -13,9 +21,15 @@ from urllib.parse import urlparse
 import hashlib
 
 import requests
-from requests.auth import HTTPBasicAuth
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from mysql.connector import pooling, Error as MySQLError
 
+try:
+    import orjson  # opcional: serialização JSON em C
+except ImportError:
+    orjson = None
+
 # ========== .env loader (sem dependências) ==========
 
 def load_dotenv(path: str = ".env") -> None:
@@ -48,34 +62,107 @@ DEFAULT_INLINE_BLOCKLIST = [
     "static1.squarespace.com",
 ]
 
-ERRORS: List[Dict[str, Any]] = []
+@functools.lru_cache(maxsize=8)
+def block_hosts_re(hosts: Tuple[str, ...]) -> Optional["re.Pattern[str]"]:
+    """Uma única alternação compilada para a lista de bloqueio (None se a lista estiver vazia)."""
+    hosts = tuple(h for h in hosts if h)
+    if not hosts:
+        return None
+    return re.compile("|".join(map(re.escape, hosts)), re.IGNORECASE)
+
+# log de erros gravado em streaming: cada log_error vira uma linha no CSV na hora,
+# então a memória não cresce com o número de erros e um crash não perde o log.
+# Colunas fixas e declaradas (o cabeçalho sai já no primeiro erro); o corretivo.py
+# procura contact_fresh_id/contact_id e company_fresh_id/company_id pelo nome, e
+# pega a primeira que aparecer, por isso contact_fresh_id vem antes de contact_id
+# (mesma ordem do cabeçalho ordenado antigo). Chaves fora da lista vão como JSON em "extra".
+ERROR_EXTRA_COLS = [
+    "conv_id", "name", "url", "size", "content_type", "host", "http_status", "err",
+    "contact_fresh_id", "contact_id", "email", "company_fresh_id", "company_name",
+]
+ERROR_COLS = ["ts_utc", "type", "ticket_id", *ERROR_EXTRA_COLS, "extra"]
+ERROR_FSYNC_EVERY = 100
+
+_ERROR_LOCK = threading.Lock()
+_ERROR_LOG_PATH: Optional[str] = None
+_ERROR_FILE = None
+_ERROR_WRITER = None
+_ERROR_COUNT = 0
+
+def default_error_log_path() -> str:
+    return f"./errors_freshdesk_sync_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
+
+def open_error_log(path: str):
+    """Define o CSV de erros; o arquivo só é criado no primeiro erro."""
+    global _ERROR_LOG_PATH
+    with _ERROR_LOCK:
+        _ERROR_LOG_PATH = path
 
 def log_error(kind: str, ticket_id: Optional[int] = None, **extra):
-    ERRORS.append({
-        "ts_utc": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
-        "type": kind,
-        "ticket_id": ticket_id,
-        **extra
-    })
-
-def write_error_csv(path: str):
-    if not ERRORS:
-        return
-    cols = sorted({k for row in ERRORS for k in row.keys()})
-    try:
-        with open(path, "w", newline="", encoding="utf-8") as f:
-            w = csv.DictWriter(f, fieldnames=cols)
-            w.writeheader()
-            w.writerows(ERRORS)
-        print(f"[ok] Log de erros salvo em: {path}")
-    except Exception as e:
-        print(f"[warn] Falhou ao salvar log CSV: {e}", file=sys.stderr)
+    global _ERROR_LOG_PATH, _ERROR_FILE, _ERROR_WRITER, _ERROR_COUNT
+    row = [
+        datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        kind,
+        "" if ticket_id is None else ticket_id,
+    ]
+    for col in ERROR_EXTRA_COLS:
+        v = extra.pop(col, None)
+        row.append("" if v is None else v)
+    row.append(json.dumps(extra, ensure_ascii=False, default=str) if extra else "")
+    with _ERROR_LOCK:
+        if _ERROR_WRITER is None:
+            if _ERROR_LOG_PATH is None:
+                _ERROR_LOG_PATH = default_error_log_path()
+            try:
+                _ERROR_FILE = open(_ERROR_LOG_PATH, "w", newline="", encoding="utf-8", buffering=1 << 16)
+                _ERROR_WRITER = csv.writer(_ERROR_FILE)
+                _ERROR_WRITER.writerow(ERROR_COLS)
+            except Exception as e:
+                print(f"[warn] Falhou ao abrir log CSV: {e}", file=sys.stderr)
+                return
+        _ERROR_WRITER.writerow(row)
+        _ERROR_COUNT += 1
+        if _ERROR_COUNT % ERROR_FSYNC_EVERY == 0:
+            _ERROR_FILE.flush()
+            os.fsync(_ERROR_FILE.fileno())
+
+def close_error_log():
+    global _ERROR_FILE, _ERROR_WRITER
+    with _ERROR_LOCK:
+        if _ERROR_FILE is None:
+            return
+        try:
+            _ERROR_FILE.flush()
+            os.fsync(_ERROR_FILE.fileno())
+            _ERROR_FILE.close()
+            print(f"[ok] Log de erros salvo em: {_ERROR_LOG_PATH} ({_ERROR_COUNT} linhas)")
+        except Exception as e:
+            print(f"[warn] Falhou ao salvar log CSV: {e}", file=sys.stderr)
+        _ERROR_FILE = None
+        _ERROR_WRITER = None
 
 def html_to_text(html: Optional[str]) -> str:
     if not html:
         return ""
+    if "<" not in html:
+        return unescape(html)
     return unescape(TAG_RE.sub("", html))
 
+def json_dumps(obj: Any) -> str:
+    """json.dumps(obj, ensure_ascii=False), via orjson quando disponível."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except TypeError:
+            pass  # ex.: inteiros > 64 bits; a stdlib serializa
+    return json.dumps(obj, ensure_ascii=False)
+
+def response_json(r: requests.Response) -> Any:
+    """r.json(), mas com orjson direto sobre os bytes quando disponível."""
+    if orjson is not None:
+        return orjson.loads(r.content)
+    return r.json()
+
 def env_or(*keys: str, default: Optional[str] = None) -> Optional[str]:
     for k in keys:
         v = os.getenv(k)
@@ -89,25 +176,33 @@ def env_bool(name: str, default: bool = False) -> bool:
         return default
     return v.strip().lower() in ("1", "true", "yes", "y", "on")
 
+# fromisoformat aceita o sufixo "Z" a partir do 3.11; antes disso é preciso trocar por +00:00
+_FROMISO_Z = sys.version_info >= (3, 11)
+
+def _fromiso(s: str) -> datetime:
+    if s.endswith("Z") and not _FROMISO_Z:
+        s = s[:-1] + "+00:00"
+    return datetime.fromisoformat(s)
+
+# timestamps se repetem muito num lote (datas de ticket/conversas): parse memoizado
+@functools.lru_cache(maxsize=16384)
 def parse_dt(s: Optional[str]) -> Optional[str]:
     if not s:
         return None
+    # formato do Freshdesk (YYYY-MM-DDTHH:MM:SSZ): o resultado é o próprio texto, sem parse
+    if len(s) == 20 and s[10] == "T" and s[19] == "Z" and s[:4].isdigit() and s[11:13].isdigit():
+        return f"{s[:10]} {s[11:19]}"
     try:
-        if s.endswith("Z"):
-            dt = datetime.fromisoformat(s.replace("Z", "+00:00"))
-        else:
-            dt = datetime.fromisoformat(s)
-        return dt.strftime("%Y-%m-%d %H:%M:%S")
+        return _fromiso(s).strftime("%Y-%m-%d %H:%M:%S")
     except Exception:
         return s.replace("T", " ").split(".")[0]
 
+@functools.lru_cache(maxsize=16384)
 def parse_dt_obj(s: Optional[str]) -> Optional[datetime]:
     if not s:
         return None
     try:
-        if s.endswith("Z"):
-            return datetime.fromisoformat(s.replace("Z", "+00:00")).astimezone(timezone.utc)
-        dt = datetime.fromisoformat(s)
+        dt = _fromiso(s)
         if dt.tzinfo is None:
             dt = dt.replace(tzinfo=timezone.utc)
         else:
@@ -127,8 +222,11 @@ def parse_date_ymd(s: Optional[str]) -> Optional[datetime]:
     except Exception:
         return None
 
+# caracteres proibidos em nomes de arquivo (Windows) + controles ASCII -> "_"
+_SAFE_FILENAME_TABLE = str.maketrans({c: "_" for c in '<>:"/\\|?*' + "".join(map(chr, range(0x20)))})
+
 def safe_filename(name: str) -> str:
-    return re.sub(r'[<>:"/\\|?*\x00-\x1F]', "_", name)[:180]
+    return name.translate(_SAFE_FILENAME_TABLE)[:180]
 
 def ensure_dir(p: Path):
     p.mkdir(parents=True, exist_ok=True)
@@ -141,6 +239,64 @@ def save_bytes(path: Path, content: bytes) -> None:
 def sha256_bytes(content: bytes) -> str:
     return hashlib.sha256(content).hexdigest()
 
+DOWNLOAD_CHUNK = 1 << 20
+
+def download_and_hash(url: str, path: Path, max_bytes: Optional[int] = None,
+                      session: Optional[requests.Session] = None,
+                      timeout: int = 120,
+                      content_type_ok: Optional[Callable[[Optional[str]], bool]] = None,
+                      ) -> Tuple[Optional[str], int, Optional[str]]:
+    """
+    Baixa `url` em streaming direto para `path`, calculando o SHA-256 na mesma passada
+    (blocos de 1 MiB, sem manter o arquivo inteiro em memória).
+    Retorna (sha256, tamanho, content-type). Retorna sha256=None, sem ler o corpo, se
+    os headers da resposta já reprovam o arquivo (Content-Length > `max_bytes` ou
+    `content_type_ok(ct)` falso); idem, removendo o parcial, se o download passar de `max_bytes`.
+    Em erro, o arquivo parcial é removido e a exceção propagada.
+    A pasta de `path` já deve existir (os coletores criam a pasta do ticket uma vez).
+    """
+    h = hashlib.sha256()
+    size = 0
+    try:
+        with (session or _DOWNLOAD_SESSION).get(url, stream=True, timeout=timeout) as r:
+            r.raise_for_status()
+            ctype = r.headers.get("Content-Type")
+            try:
+                announced = int(r.headers.get("Content-Length") or 0)
+            except ValueError:
+                announced = 0
+            # os headers do próprio GET substituem um HEAD prévio: reprovado aqui, o corpo nem é lido
+            if max_bytes is not None and announced > max_bytes:
+                return None, announced, ctype
+            if content_type_ok is not None and not content_type_ok(ctype):
+                return None, announced, ctype
+            with open(path, "wb", buffering=DOWNLOAD_CHUNK) as f:
+                for chunk in r.iter_content(DOWNLOAD_CHUNK):
+                    if not chunk:
+                        continue
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        break
+                    h.update(chunk)
+                    f.write(chunk)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    if max_bytes is not None and size > max_bytes:
+        path.unlink(missing_ok=True)
+        return None, size, ctype
+    return h.hexdigest(), size, ctype
+
+def file_sha256(path: Path) -> str:
+    """SHA-256 de um arquivo já em disco, em blocos (hashlib.file_digest no 3.11+)."""
+    with open(path, "rb") as f:
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        h = hashlib.sha256()
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK), b""):
+            h.update(chunk)
+        return h.hexdigest()
+
 def hostname(url: str) -> str:
     try:
         return urlparse(url).netloc.lower()
@@ -151,6 +307,11 @@ INT32_MIN = -2147483648
 INT32_MAX =  2147483647
 
 def int32_or_none(v) -> Optional[int]:
+    # ids do JSON já chegam como int; None/"" não precisam passar pelo try/except
+    if type(v) is int:
+        return v if INT32_MIN <= v <= INT32_MAX else None
+    if v is None or v == "":
+        return None
     try:
         n = int(v)
         if INT32_MIN <= n <= INT32_MAX:
@@ -160,43 +321,84 @@ def int32_or_none(v) -> Optional[int]:
     return None
 
 def to_int_or_none(v) -> Optional[int]:
+    if type(v) is int:
+        return v
+    if v is None or v == "":
+        return None
     try:
         return int(v)
     except Exception:
         return None
 
-def cf_pick(cf: Dict[str, Any], *aliases: str):
-    for k in aliases:
-        if k in cf:
-            return cf.get(k)
-    for k in aliases:
-        kk = f"cf_{k}"
-        if kk in cf:
-            return cf.get(kk)
-    alt_map = {
-        "codigo": ["cdigo", "codigo"],
-        "numero": ["nmero", "numero"],
-        "endereco": ["endereco", "endereo"],
-        "cidade": ["cidade"],
-        "estado": ["estado"],
-        "email_padrao": ["email_padrao", "email_padro"],
-        "tipo_de_cliente": ["tipo_de_cliente"],
-        "grupo_de_cliente": ["grupo_de_cliente"],
-    }
-    for k in aliases:
-        if k in alt_map:
-            for alt in alt_map[k]:
-                if alt in cf:
-                    return cf.get(alt)
-                cfk = f"cf_{alt}"
-                if cfk in cf:
-                    return cf.get(cfk)
+_CF_ALT_MAP = {
+    "codigo": ["cdigo", "codigo"],
+    "numero": ["nmero", "numero"],
+    "endereco": ["endereco", "endereo"],
+    "cidade": ["cidade"],
+    "estado": ["estado"],
+    "email_padrao": ["email_padrao", "email_padro"],
+    "tipo_de_cliente": ["tipo_de_cliente"],
+    "grupo_de_cliente": ["grupo_de_cliente"],
+}
+
+def _cf_probe_keys(alias: str) -> Tuple[str, ...]:
+    # mesma ordem de antes: alias, cf_alias, depois cada variante (sem/com cf_)
+    keys = [alias, f"cf_{alias}"]
+    for alt in _CF_ALT_MAP.get(alias, []):
+        keys += [alt, f"cf_{alt}"]
+    return tuple(dict.fromkeys(keys))
+
+# chaves a testar por campo lógico, montadas uma vez no import
+CF_PROBES: Dict[str, Tuple[str, ...]] = {k: _cf_probe_keys(k) for k in _CF_ALT_MAP}
+
+_MISSING = object()
+
+def cf_pick(cf: Dict[str, Any], alias: str):
+    for k in CF_PROBES.get(alias) or _cf_probe_keys(alias):
+        v = cf.get(k, _MISSING)
+        if v is not _MISSING:
+            return v
     return None
 
+# ========== Sessões HTTP ==========
+
+def new_session(pool_size: int = 32, retry_429: bool = True) -> requests.Session:
+    """
+    Sessão com keep-alive (reaproveita TCP/TLS) e retry para 5xx (e 429, respeitando
+    Retry-After, se retry_429). Sem retry_429 o 429 volta para quem chamou tratar.
+    """
+    s = requests.Session()
+    retry = Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504] if retry_429 else [500, 502, 503, 504],
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+# 429 do Freshdesk fica só com o laço de fd_get (espera limitada a 60s): sem duas camadas de retry
+_FD_SESSION = new_session(retry_429=False)
+_OCTA_SESSION = new_session()
+# downloads de anexos/inline (CDN/S3): sem auth na sessão, URLs já vêm assinadas
+_DOWNLOAD_SESSION = new_session()
+
+def close_sessions() -> None:
+    _FD_SESSION.close()
+    _OCTA_SESSION.close()
+    _DOWNLOAD_SESSION.close()
+
 # ========== Freshdesk API ==========
 
-def fd_headers() -> Dict[str, str]:
-    return {"Content-Type": "application/json", "Accept": "application/json"}
+@functools.lru_cache(maxsize=4)
+def fd_headers(api_key: str) -> Dict[str, str]:
+    """Cabeçalhos da API com o Basic auth já codificado (calculado uma vez por chave)."""
+    token = base64.b64encode(f"{api_key}:X".encode("utf-8")).decode("ascii")
+    return {"Content-Type": "application/json", "Accept": "application/json", "Authorization": f"Basic {token}"}
 
 def fd_base(domain: str) -> str:
     domain = (domain or "").strip().rstrip("/")
@@ -206,12 +408,31 @@ def fd_base(domain: str) -> str:
         domain = "https://" + domain
     return domain
 
-def fd_get(domain: str, api_key: str, path: str, query: str = "") -> requests.Response:
+# teto de requisições simultâneas à API do Freshdesk, somando todas as threads
+# (prefetch de tickets e entidades): mais que isso só antecipa o 429
+FD_MAX_IN_FLIGHT = 20
+_FD_IN_FLIGHT = threading.BoundedSemaphore(FD_MAX_IN_FLIGHT)
+
+def fd_get(domain: str, api_key: str, path: str, query: str = "", max_retries: int = 5) -> requests.Response:
     url = f"{fd_base(domain)}/api/v2{path}{query}"
-    auth = HTTPBasicAuth(api_key, "X")
-    r = requests.get(url, headers=fd_headers(), auth=auth, timeout=120)
-    r.raise_for_status()
-    return r
+    headers = fd_headers(api_key)
+    attempt = 0
+    while True:
+        # _FD_SESSION não retenta 429 (new_session(retry_429=False)): o GET devolve o 429
+        # na hora e a espera do Retry-After abaixo acontece já fora do semáforo
+        with _FD_IN_FLIGHT:
+            r = _FD_SESSION.get(url, headers=headers, timeout=120)
+        # com várias requisições simultâneas o rate limit aparece: respeita o Retry-After
+        if r.status_code == 429 and attempt < max_retries:
+            retry_after = r.headers.get("Retry-After")
+            wait = float(retry_after) if retry_after and retry_after.isdigit() else float(2 ** attempt)
+            wait = min(wait, 60.0)
+            print(f"[warn] 429 Freshdesk em {path}; aguardando {wait:.0f}s", file=sys.stderr)
+            time.sleep(wait)
+            attempt += 1
+            continue
+        r.raise_for_status()
+        return r
 
 def fd_paginate_tickets(domain: str, api_key: str, per_page: int = 100, page_start: int = 1, updated_since: Optional[str] = None):
     page = page_start
@@ -220,7 +441,7 @@ def fd_paginate_tickets(domain: str, api_key: str, per_page: int = 100, page_sta
         if updated_since:
             q += f"&updated_since={updated_since}"
         r = fd_get(domain, api_key, "/tickets", q)
-        data = r.json()
+        data = response_json(r)
         if not data:
             break
         for item in data:
@@ -231,39 +452,93 @@ def fd_paginate_tickets(domain: str, api_key: str, per_page: int = 100, page_sta
 
 def fd_get_ticket(domain: str, api_key: str, ticket_id: int) -> Dict[str, Any]:
     r = fd_get(domain, api_key, f"/tickets/{ticket_id}", "?include=conversations,stats")
-    return r.json()
+    return response_json(r)
+
+def prefetch_ordered(fetch: Callable[[int], Any], ticket_ids: List[int], workers: int = 8):
+    """
+    Executa `fetch(tid)` em paralelo (até `workers` chamadas simultâneas) e
+    entrega (tid, resultado, erro) na mesma ordem de `ticket_ids`.
+    Mantém no máximo 2*workers resultados em voo/memória.
+    """
+    if workers <= 1:
+        for tid in ticket_ids:
+            try:
+                yield tid, fetch(tid), None
+            except Exception as e:
+                yield tid, None, e
+        return
+
+    it = iter(ticket_ids)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque((tid, executor.submit(fetch, tid)) for tid in islice(it, workers * 2))
+        try:
+            while pending:
+                tid, fut = pending.popleft()
+                for nxt in islice(it, 1):
+                    pending.append((nxt, executor.submit(fetch, nxt)))
+                try:
+                    yield tid, fut.result(), None
+                except Exception as e:
+                    yield tid, None, e
+        finally:
+            # consumidor parou antes do fim (erro no banco, Ctrl+C): não espera a janela
+            # inteira de buscas já enfileiradas, só as que estão rodando
+            for _, fut in pending:
+                fut.cancel()
+
+# agentes/grupos/contatos/empresas se repetem entre tickets: memoizados por (domain, api_key, id).
+# Só sucessos e 404 entram no cache; timeout/reset/5xx sobem da função cacheada
+# (lru_cache não guarda exceções) e são tratados no wrapper, então o próximo ticket tenta de novo.
+def _fd_get_entity(domain: str, api_key: str, path: str) -> Optional[Dict[str, Any]]:
+    try:
+        r = fd_get(domain, api_key, path)
+        return response_json(r)
+    except requests.HTTPError as he:
+        if he.response is not None and he.response.status_code == 404:
+            return None
+        raise
+
+@functools.lru_cache(maxsize=2048)
+def _fd_get_agent_cached(domain: str, api_key: str, agent_id: int) -> Optional[Dict[str, Any]]:
+    return _fd_get_entity(domain, api_key, f"/agents/{agent_id}")
+
+@functools.lru_cache(maxsize=2048)
+def _fd_get_group_cached(domain: str, api_key: str, group_id: int) -> Optional[Dict[str, Any]]:
+    return _fd_get_entity(domain, api_key, f"/groups/{group_id}")
+
+@functools.lru_cache(maxsize=8192)
+def _fd_get_contact_cached(domain: str, api_key: str, contact_id: int) -> Optional[Dict[str, Any]]:
+    return _fd_get_entity(domain, api_key, f"/contacts/{contact_id}")
+
+@functools.lru_cache(maxsize=4096)
+def _fd_get_company_cached(domain: str, api_key: str, company_id: int) -> Optional[Dict[str, Any]]:
+    return _fd_get_entity(domain, api_key, f"/companies/{company_id}")
 
 def fd_get_agent(domain: str, api_key: str, agent_id: int) -> Optional[Dict[str, Any]]:
     try:
-        r = fd_get(domain, api_key, f"/agents/{agent_id}")
-        return r.json()
+        return _fd_get_agent_cached(domain, api_key, agent_id)
     except Exception as e:
         print(f"[warn] agente {agent_id} não carregado: {e}", file=sys.stderr)
         return None
 
 def fd_get_group(domain: str, api_key: str, group_id: int) -> Optional[Dict[str, Any]]:
     try:
-        r = fd_get(domain, api_key, f"/groups/{group_id}")
-        return r.json()
+        return _fd_get_group_cached(domain, api_key, group_id)
     except Exception as e:
         print(f"[warn] grupo {group_id} não carregado: {e}", file=sys.stderr)
         return None
 
 def fd_get_contact(domain: str, api_key: str, contact_id: int) -> Optional[Dict[str, Any]]:
     try:
-        r = fd_get(domain, api_key, f"/contacts/{contact_id}")
-        return r.json()
-    except requests.HTTPError as he:
-        if he.response is not None and he.response.status_code == 404:
-            return None
+        return _fd_get_contact_cached(domain, api_key, contact_id)
+    except requests.HTTPError:
         raise
     except Exception:
         return None
 
 def fd_get_company(domain: str, api_key: str, company_id: int) -> Optional[Dict[str, Any]]:
     try:
-        r = fd_get(domain, api_key, f"/companies/{company_id}")
-        return r.json()
+        return _fd_get_company_cached(domain, api_key, company_id)
     except Exception as e:
         print(f"[warn] company {company_id} não carregada: {e}", file=sys.stderr)
         return None
@@ -290,12 +565,12 @@ def _fmt_err_body(text: str, maxlen: int = 240) -> str:
 
 def octa_get(base_url: str, api_key: str, agent_email: Optional[str], path: str, params: Optional[Dict[str, Any]] = None, timeout: int = 60) -> Dict[str, Any]:
     url = f"{octa_base(base_url)}{path}"
-    r = requests.get(url, headers=octa_headers(api_key, agent_email), params=params or {}, timeout=timeout)
+    r = _OCTA_SESSION.get(url, headers=octa_headers(api_key, agent_email), params=params or {}, timeout=timeout)
     if not r.ok:
         print(f"[warn] Octa GET {path} status={r.status_code} params={params}", file=sys.stderr)
     r.raise_for_status()
     try:
-        return r.json()
+        return response_json(r)
     except Exception:
         return {}
 
@@ -309,117 +584,223 @@ def _first_item(payload: Any) -> Optional[Dict[str, Any]]:
         return payload[0]
     return None
 
-_OCTA_CONTACT_BY_EMAIL: Dict[str, Dict[str, Any]] = {}
-_OCTA_CONTACT_BY_CF: Dict[Tuple[str, str], Dict[str, Any]] = {}
-_OCTA_ORG_BY_NAME: Dict[str, Dict[str, Any]] = {}
-_OCTA_ORG_BY_CF: Dict[Tuple[str, str], Dict[str, Any]] = {}
+# caches de lookup no Octa; guardam também "não encontrado" (None) quando a API
+# respondeu sem itens. Erros de requisição não são cacheados.
+_OCTA_CONTACT_BY_EMAIL: Dict[str, Optional[Dict[str, Any]]] = {}
+_OCTA_CONTACT_BY_CF: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}
+_OCTA_ORG_BY_NAME: Dict[str, Optional[Dict[str, Any]]] = {}
+_OCTA_ORG_BY_CF: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}
+# vira False na primeira resposta INVALID_PROPERTY: o ambiente não aceita filtros em /organizations
+_OCTA_ORG_FILTERS_OK = True
+# um lock por chave de busca: tickets do mesmo contato/empresa buscados em paralelo
+# esperam a primeira consulta e leem o cache, em vez de repetir o GET
+_OCTA_KEY_LOCKS: Dict[Tuple[str, ...], threading.Lock] = {}
+_OCTA_KEY_LOCKS_GUARD = threading.Lock()
+
+def _octa_key_lock(*key: str) -> threading.Lock:
+    with _OCTA_KEY_LOCKS_GUARD:
+        lock = _OCTA_KEY_LOCKS.get(key)
+        if lock is None:
+            lock = _OCTA_KEY_LOCKS[key] = threading.Lock()
+        return lock
+
+def clear_lookup_caches():
+    """Zera os caches de entidades Freshdesk e de lookups Octa (início de cada sincronização)."""
+    global _OCTA_ORG_FILTERS_OK
+    for fn in (_fd_get_agent_cached, _fd_get_group_cached, _fd_get_contact_cached, _fd_get_company_cached):
+        fn.cache_clear()
+    for cache in (_OCTA_CONTACT_BY_EMAIL, _OCTA_CONTACT_BY_CF, _OCTA_ORG_BY_NAME, _OCTA_ORG_BY_CF):
+        cache.clear()
+    _OCTA_ORG_FILTERS_OK = True
 
 def octa_find_contact(api_url: str, api_key: str, agent_email: Optional[str],
                       email: Optional[str], fresh_contact_id: Optional[int],
                       cf_key: Optional[str], timeout: int = 60) -> Optional[Dict[str, Any]]:
     if email:
-        if email in _OCTA_CONTACT_BY_EMAIL:
-            return _OCTA_CONTACT_BY_EMAIL[email]
-        params = {
-            "limit": 1,
-            "filters[0][property]": "email",
-            "filters[0][operator]": "eq",
-            "filters[0][value]": email
-        }
-        try:
-            data = octa_get(api_url, api_key, agent_email, "/contacts", params, timeout=timeout)
-            item = _first_item(data)
-            if item:
-                _OCTA_CONTACT_BY_EMAIL[email] = item
-                return item
-        except Exception as e:
-            print(f"[warn] Octa contato GET por email falhou: {e}", file=sys.stderr)
+        with _octa_key_lock("contact_email", email):
+            if email in _OCTA_CONTACT_BY_EMAIL:
+                item = _OCTA_CONTACT_BY_EMAIL[email]
+            else:
+                item = None
+                params = {
+                    "limit": 1,
+                    "filters[0][property]": "email",
+                    "filters[0][operator]": "eq",
+                    "filters[0][value]": email
+                }
+                try:
+                    data = octa_get(api_url, api_key, agent_email, "/contacts", params, timeout=timeout)
+                    item = _first_item(data)
+                    _OCTA_CONTACT_BY_EMAIL[email] = item
+                except Exception as e:
+                    print(f"[warn] Octa contato GET por email falhou: {e}", file=sys.stderr)
+        if item:
+            return item
 
     if cf_key and fresh_contact_id is not None:
         value = str(fresh_contact_id)
         prop = f"customFields.{cf_key}"
         cache_k = (prop, value)
-        if cache_k in _OCTA_CONTACT_BY_CF:
-            return _OCTA_CONTACT_BY_CF[cache_k]
-        params = {
-            "limit": 1,
-            "filters[0][property]": prop,
-            "filters[0][operator]": "eq",
-            "filters[0][value]": value
-        }
-        try:
-            data = octa_get(api_url, api_key, agent_email, "/contacts", params, timeout=timeout)
-            item = _first_item(data)
-            if item:
+        with _octa_key_lock("contact_cf", prop, value):
+            if cache_k in _OCTA_CONTACT_BY_CF:
+                return _OCTA_CONTACT_BY_CF[cache_k]
+            params = {
+                "limit": 1,
+                "filters[0][property]": prop,
+                "filters[0][operator]": "eq",
+                "filters[0][value]": value
+            }
+            try:
+                data = octa_get(api_url, api_key, agent_email, "/contacts", params, timeout=timeout)
+                item = _first_item(data)
                 _OCTA_CONTACT_BY_CF[cache_k] = item
-                return item
-        except requests.HTTPError as he:
-            body_prev = _fmt_err_body(getattr(he.response, "text", "") if getattr(he, "response", None) else "")
-            print(f"[warn] Octa contato GET por CF falhou: {he} body={body_prev}", file=sys.stderr)
-        except Exception as e:
-            print(f"[warn] Octa contato GET por CF falhou: {e}", file=sys.stderr)
+                if item:
+                    return item
+            except requests.HTTPError as he:
+                body_prev = _fmt_err_body(getattr(he.response, "text", "") if getattr(he, "response", None) else "")
+                print(f"[warn] Octa contato GET por CF falhou: {he} body={body_prev}", file=sys.stderr)
+            except Exception as e:
+                print(f"[warn] Octa contato GET por CF falhou: {e}", file=sys.stderr)
 
     return None
 
 def octa_find_organization(api_url: str, api_key: str, agent_email: Optional[str],
                            name: Optional[str], fresh_company_id: Optional[int],
                            cf_key: Optional[str], timeout: int = 60) -> Optional[Dict[str, Any]]:
+    global _OCTA_ORG_FILTERS_OK
     # muitos ambientes do Octa não aceitam 'filters' em /organizations (retorna INVALID_PROPERTY).
     # nesse caso, não insistimos — preferimos organization vindo do contato.
-    try_filters = True
     # 1) por CF (se aceito)
-    if try_filters and cf_key and fresh_company_id is not None:
+    if _OCTA_ORG_FILTERS_OK and cf_key and fresh_company_id is not None:
         value = str(fresh_company_id)
         prop = f"customFields.{cf_key}"
         cache_k = (prop, value)
-        if cache_k in _OCTA_ORG_BY_CF:
-            return _OCTA_ORG_BY_CF[cache_k]
-        params = {
-            "limit": 1,
-            "filters[0][property]": prop,
-            "filters[0][operator]": "eq",
-            "filters[0][value]": value
-        }
-        try:
-            data = octa_get(api_url, api_key, agent_email, "/organizations", params, timeout=timeout)
-            item = _first_item(data)
-            if item:
-                _OCTA_ORG_BY_CF[cache_k] = item
-                return item
-        except requests.HTTPError as he:
-            txt = _fmt_err_body(getattr(he.response, "text", "") if getattr(he, "response", None) else "")
-            if "INVALID_PROPERTY" in txt:
-                try_filters = False
-            print(f"[warn] Octa org GET por CF falhou: {he} body={txt}", file=sys.stderr)
-        except Exception as e:
-            print(f"[warn] Octa org GET por CF falhou: {e}", file=sys.stderr)
+        with _octa_key_lock("org_cf", prop, value):
+            if cache_k in _OCTA_ORG_BY_CF:
+                item = _OCTA_ORG_BY_CF[cache_k]
+                if item:
+                    return item
+            elif _OCTA_ORG_FILTERS_OK:
+                params = {
+                    "limit": 1,
+                    "filters[0][property]": prop,
+                    "filters[0][operator]": "eq",
+                    "filters[0][value]": value
+                }
+                try:
+                    data = octa_get(api_url, api_key, agent_email, "/organizations", params, timeout=timeout)
+                    item = _first_item(data)
+                    _OCTA_ORG_BY_CF[cache_k] = item
+                    if item:
+                        return item
+                except requests.HTTPError as he:
+                    txt = _fmt_err_body(getattr(he.response, "text", "") if getattr(he, "response", None) else "")
+                    if "INVALID_PROPERTY" in txt:
+                        _OCTA_ORG_FILTERS_OK = False
+                    print(f"[warn] Octa org GET por CF falhou: {he} body={txt}", file=sys.stderr)
+                except Exception as e:
+                    print(f"[warn] Octa org GET por CF falhou: {e}", file=sys.stderr)
 
     # 2) por nome (muitos ambientes também rejeitam)
-    if try_filters and name:
-        if name in _OCTA_ORG_BY_NAME:
-            return _OCTA_ORG_BY_NAME[name]
-        params = {
-            "limit": 1,
-            "filters[0][property]": "name",
-            "filters[0][operator]": "eq",
-            "filters[0][value]": name
-        }
-        try:
-            data = octa_get(api_url, api_key, agent_email, "/organizations", params, timeout=timeout)
-            item = _first_item(data)
-            if item:
+    if _OCTA_ORG_FILTERS_OK and name:
+        with _octa_key_lock("org_name", name):
+            if name in _OCTA_ORG_BY_NAME:
+                return _OCTA_ORG_BY_NAME[name]
+            params = {
+                "limit": 1,
+                "filters[0][property]": "name",
+                "filters[0][operator]": "eq",
+                "filters[0][value]": name
+            }
+            try:
+                data = octa_get(api_url, api_key, agent_email, "/organizations", params, timeout=timeout)
+                item = _first_item(data)
                 _OCTA_ORG_BY_NAME[name] = item
-                return item
-        except requests.HTTPError as he:
-            txt = _fmt_err_body(getattr(he.response, "text", "") if getattr(he, "response", None) else "")
-            print(f"[warn] Octa org GET por nome falhou: {he} body={txt}", file=sys.stderr)
-        except Exception as e:
-            print(f"[warn] Octa org GET por nome falhou: {e}", file=sys.stderr)
+                if item:
+                    return item
+            except requests.HTTPError as he:
+                txt = _fmt_err_body(getattr(he.response, "text", "") if getattr(he, "response", None) else "")
+                print(f"[warn] Octa org GET por nome falhou: {he} body={txt}", file=sys.stderr)
+            except Exception as e:
+                print(f"[warn] Octa org GET por nome falhou: {e}", file=sys.stderr)
 
     return None
 
 # ========== MySQL ==========
 
+EXEC_MANY_CHUNK = 1000
+# fallback se não der para ler @@max_allowed_packet (default do MySQL 8 é 64 MiB)
+DEFAULT_MAX_ALLOWED_PACKET = 16 * 1024 * 1024
+
+def _row_bytes(row: Dict[str, Any]) -> int:
+    # estimativa do tamanho da tupla no INSERT multi-VALUES (raw_json domina)
+    n = 16
+    for v in row.values():
+        if v is None:
+            n += 5
+        elif isinstance(v, str):
+            n += (len(v) if v.isascii() else len(v) * 4) + 4  # utf8mb4: até 4 bytes por caractere
+        elif isinstance(v, bytes):
+            n += len(v) + 4
+        else:
+            n += 24
+    return n
+
+def _row_chunks(rows: List[Dict[str, Any]], max_rows: int, max_bytes: int):
+    """Lotes de até max_rows linhas cujo INSERT estimado cabe em max_bytes."""
+    chunk: List[Dict[str, Any]] = []
+    size = 0
+    for r in rows:
+        rb = _row_bytes(r)
+        if chunk and (len(chunk) >= max_rows or size + rb > max_bytes):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(r)
+        size += rb
+    if chunk:
+        yield chunk
+
+_UPSERT_SPLIT_RE = re.compile(r"^(.*?\)\s*VALUES\s*)(\(.*?\))(\s*ON\s+DUPLICATE\s+KEY\s+UPDATE\b.*)$", re.S | re.I)
+_NAMED_PARAM_RE = re.compile(r"%\((\w+)\)s")
+
+@functools.lru_cache(maxsize=32)
+def _split_upsert(sql: str) -> Optional[Tuple[str, str, str, Tuple[str, ...]]]:
+    """
+    INSERT ... VALUES (%(a)s, ...) ON DUPLICATE KEY UPDATE ... -> (cabeça, tupla posicional,
+    cauda, chaves na ordem). None se o SQL não tiver esse formato (aí fica o executemany).
+    """
+    m = _UPSERT_SPLIT_RE.match(sql)
+    if not m or _NAMED_PARAM_RE.search(m.group(3)):
+        return None
+    keys = tuple(_NAMED_PARAM_RE.findall(m.group(2)))
+    if not keys:
+        return None
+    # a tupla só tem placeholders e vírgulas: sem espaços, já que ela se repete por linha
+    return m.group(1), "".join(_NAMED_PARAM_RE.sub("%s", m.group(2)).split()), m.group(3), keys
+
+@functools.lru_cache(maxsize=64)
+def _multi_values_sql(sql: str, n: int) -> str:
+    head, row_tpl, tail, _ = _split_upsert(sql)
+    return head + ",".join([row_tpl] * n) + tail
+
+@functools.lru_cache(maxsize=128)
+def _select_in_sql(table: str, cols: Tuple[str, ...], key_col: str, n: int) -> str:
+    """SELECT cols FROM table WHERE key_col IN (%s x n), montado uma vez por (tabela, colunas, n)."""
+    return (f"SELECT {', '.join(f'`{c}`' for c in cols)} FROM `{table}` "
+            f"WHERE `{key_col}` IN ({','.join(['%s'] * n)})")
+
+def _execute_upsert_chunk(cur, sql: str, chunk: List[Dict[str, Any]]):
+    """
+    Um único INSERT ... VALUES (...),(...) ON DUPLICATE KEY UPDATE para o lote inteiro,
+    montado aqui em vez de depender da reescrita por regex do executemany do conector.
+    """
+    parts = _split_upsert(sql)
+    if parts is None:
+        cur.executemany(sql, chunk)
+        return
+    keys = parts[3]
+    cur.execute(_multi_values_sql(sql, len(chunk)), [r[k] for r in chunk for k in keys])
+
 class MySQL:
     def __init__(self, host: str, user: str, password: str, database: str, pool_size: int = 5):
         try:
@@ -432,42 +813,141 @@ class MySQL:
                 database=database,
                 charset="utf8mb4",
                 use_unicode=True,
+                # extensão C do conector quando instalada (cai no protocolo em Python se não houver)
+                use_pure=False,
+                # sem COM_RESET_CONNECTION a cada devolução ao pool: não usamos variáveis de sessão
+                # nem tabelas temporárias, e toda transação termina em commit/rollback
+                pool_reset_session=False,
             )
         except MySQLError as e:
             print(f"[fatal] erro ao criar pool MySQL: {e}", file=sys.stderr)
             raise
+        self._packet_limit: Optional[int] = None
+        # conexão da transação aberta por transaction() (por thread)
+        self._tx = threading.local()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Agrupa vários exec_many/exec_many_returning_ids numa única transação (um commit,
+        um flush do redo log). Dentro do bloco, os métodos usam a mesma conexão e não
+        fazem commit; o commit é feito na saída (rollback em exceção). Blocos aninhados
+        entram na transação de fora.
+        """
+        if getattr(self._tx, "conn", None) is not None:
+            yield self._tx.conn
+            return
+        conn = self.pool.get_connection()
+        conn.autocommit = False
+        self._tx.conn = conn
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._tx.conn = None
+            conn.close()
+
+    def _connection(self):
+        """(conexão, própria): a da transação aberta, ou uma nova do pool que o chamador fecha."""
+        conn = getattr(self._tx, "conn", None)
+        if conn is not None:
+            return conn, False
+        return self.pool.get_connection(), True
 
-    def exec_many(self, sql: str, rows: List[Dict[str, Any]]):
+    def _batch_bytes(self, cur) -> int:
+        """Metade do max_allowed_packet do servidor (lido uma vez) como teto de cada INSERT em lote."""
+        if self._packet_limit is None:
+            try:
+                cur.execute("SELECT @@max_allowed_packet")
+                self._packet_limit = int(cur.fetchone()[0])
+            except Exception:
+                self._packet_limit = DEFAULT_MAX_ALLOWED_PACKET
+        return max(1024 * 1024, self._packet_limit // 2)
+
+    def exec_many(self, sql: str, rows: List[Dict[str, Any]], chunk_size: int = EXEC_MANY_CHUNK):
         if not rows:
             return
-        conn = self.pool.get_connection()
+        # uma conexão para a lista inteira; cada lote vira um INSERT multi-VALUES ... ON DUPLICATE KEY,
+        # em lotes limitados por linhas e por max_allowed_packet; um commit por lote
+        # (ou nenhum, dentro de transaction())
+        conn, owned = self._connection()
         try:
             cur = conn.cursor()
-            cur.executemany(sql, rows)
-            conn.commit()
+            for chunk in _row_chunks(rows, chunk_size, self._batch_bytes(cur)):
+                _execute_upsert_chunk(cur, sql, chunk)
+                if owned:
+                    conn.commit()
             cur.close()
         except MySQLError as e:
-            conn.rollback()
+            if owned:
+                conn.rollback()
             print(f"[error] exec_many falhou: {e}\nSQL: {sql[:200]}...", file=sys.stderr)
             raise
         finally:
-            conn.close()
+            if owned:
+                conn.close()
+
+    def exec_many_returning_ids(self, sql: str, rows: List[Dict[str, Any]], table: str,
+                                id_col: str, key_col: str,
+                                chunk_size: int = EXEC_MANY_CHUNK) -> Dict[int, int]:
+        """
+        Upsert em lote (multi-VALUES, como exec_many) e depois resolve os ids gerados com
+        SELECT id_col, key_col ... WHERE key_col IN (...). Retorna {key: id}.
+        Duas idas ao banco por lote em vez de uma por linha.
+        """
+        out: Dict[int, int] = {}
+        if not rows:
+            return out
+        conn, owned = self._connection()
+        try:
+            cur = conn.cursor()
+            for chunk in _row_chunks(rows, chunk_size, self._batch_bytes(cur)):
+                _execute_upsert_chunk(cur, sql, chunk)
+                if owned:
+                    conn.commit()
+                keys = [r[key_col] for r in chunk if r.get(key_col) is not None]
+                if not keys:
+                    continue
+                cur.execute(_select_in_sql(table, (key_col, id_col), key_col, len(keys)), keys)
+                found = cur.fetchall()
+                if found and type(found[0][0]) is int and type(found[0][1]) is int:
+                    # colunas inteiras (caso normal): pares (key, id) direto para o dict, em C
+                    out.update(found)
+                else:
+                    for key, rid in found:
+                        out[int(key)] = int(rid)
+            cur.close()
+            return out
+        except MySQLError as e:
+            if owned:
+                conn.rollback()
+            print(f"[error] exec_many_returning_ids falhou: {e}\nSQL: {sql[:200]}...", file=sys.stderr)
+            raise
+        finally:
+            if owned:
+                conn.close()
 
-    def exec_one_returning_id(self, sql: str, row: Dict[str, Any]) -> int:
+    def fetch_all(self, sql: str, params: Any = None) -> List[Tuple]:
         conn = self.pool.get_connection()
         try:
             cur = conn.cursor()
-            cur.execute(sql, row)
-            conn.commit()
-            rid = cur.lastrowid
+            cur.execute(sql, params)
+            rows = cur.fetchall()
             cur.close()
-            return int(rid) if rid else 0
+            return rows
         except MySQLError as e:
-            conn.rollback()
-            print(f"[error] exec_one_returning_id falhou: {e}\nSQL: {sql[:200]}...", file=sys.stderr)
+            print(f"[error] fetch_all falhou: {e}\nSQL: {sql[:200]}...", file=sys.stderr)
             raise
         finally:
-            conn.close()
+            # encerra a transação implícita do SELECT: com pool_reset_session=False a conexão
+            # voltaria ao pool com o snapshot REPEATABLE READ ainda aberto
+            try:
+                conn.rollback()
+            finally:
+                conn.close()
 
 # ========== SQL (ajustado ao seu schema) ==========
 
@@ -720,6 +1200,12 @@ ON DUPLICATE KEY UPDATE
 
 # ========== Mapeamento de dados ==========
 
+EMPTY_ARR = "[]"
+
+def json_list(v: Any) -> str:
+    # listas vazias/ausentes (o caso comum) não passam pelo serializador
+    return json_dumps(v) if v else EMPTY_ARR
+
 def build_ticket_row(t: Dict[str, Any]) -> Dict[str, Any]:
     return {
         "freshdesk_ticket_id": t.get("id"),
@@ -734,12 +1220,12 @@ def build_ticket_row(t: Dict[str, Any]) -> Dict[str, Any]:
         "source": t.get("source"),
         "created_at_fd": parse_dt(t.get("created_at")),
         "updated_at_fd": parse_dt(t.get("updated_at")),
-        "raw_json": json.dumps(t, ensure_ascii=False),
+        "raw_json": json_dumps(t),
         "octa_ticket_id": None,
-        "tags": json.dumps(t.get("tags") or [], ensure_ascii=False),
-        "cc_emails": json.dumps(t.get("cc_emails") or [], ensure_ascii=False),
-        "fwd_emails": json.dumps(t.get("fwd_emails") or [], ensure_ascii=False),
-        "reply_cc_emails": json.dumps(t.get("reply_cc_emails") or [], ensure_ascii=False),
+        "tags": json_list(t.get("tags")),
+        "cc_emails": json_list(t.get("cc_emails")),
+        "fwd_emails": json_list(t.get("fwd_emails")),
+        "reply_cc_emails": json_list(t.get("reply_cc_emails")),
         "email_config_id": t.get("email_config_id"),
         "is_escalated": 1 if t.get("is_escalated") else 0 if t.get("is_escalated") is not None else None,
         "due_by": parse_dt(t.get("due_by")),
@@ -751,7 +1237,7 @@ def build_agent_row(a: Dict[str, Any]) -> Dict[str, Any]:
         "freshdesk_id": a.get("id"),
         "email": a.get("email") or "",
         "name": a.get("contact", {}).get("name") or a.get("name") or None,
-        "raw_json": json.dumps(a, ensure_ascii=False),
+        "raw_json": json_dumps(a),
         "octa_agent_id": None,
     }
 
@@ -759,7 +1245,7 @@ def build_group_row(g: Dict[str, Any]) -> Dict[str, Any]:
     return {
         "freshdesk_group_id": g.get("id"),
         "name": g.get("name"),
-        "raw_json": json.dumps(g, ensure_ascii=False),
+        "raw_json": json_dumps(g),
         "octa_group_id": None,
     }
 
@@ -790,7 +1276,7 @@ def build_company_row(c: Dict[str, Any]) -> Dict[str, Any]:
         "name": c.get("name"),
         "code": code_val,
         "type": company_type,
-        "raw_json": json.dumps(c, ensure_ascii=False),
+        "raw_json": json_dumps(c),
         "fresh_created_at": created_date,
         "cf_endereco": cf_pick(cf, "endereco"),
         "numero": numero_val,
@@ -808,7 +1294,7 @@ def build_contact_row(c: Dict[str, Any]) -> Dict[str, Any]:
         "email": c.get("email") or "",
         "name": c.get("name"),
         "company_id": c.get("company_id"),
-        "raw_json": json.dumps(c, ensure_ascii=False),
+        "raw_json": json_dumps(c),
         "octa_contact_id": None,
     }
 
@@ -860,24 +1346,68 @@ ALLOWED_DOC_CT = {
 }
 
 def is_signature_like(name: str, url: str) -> bool:
-    n = (name or "").lower()
-    u = (url or "").lower()
-    return bool(SIGNATURE_NAME_RE.search(n) or SIGNATURE_NAME_RE.search(u))
+    # SIGNATURE_NAME_RE já é re.I: sem cópias .lower() a cada chamada. Uma só busca sobre
+    # nome e URL juntos; nenhum padrão contém "\n", então não há casamento entre os dois
+    return SIGNATURE_NAME_RE.search(f"{name or ''}\n{url or ''}") is not None
+
+MEDIA_PREFIXES = ("image/", "audio/", "video/")
 
 def content_type_allowed(ct: Optional[str]) -> bool:
     if not ct:
         return True
-    ct = ct.lower()
-    if ct.startswith("image/") or ct.startswith("audio/") or ct.startswith("video/"):
-        return True
-    if ct in ALLOWED_DOC_CT:
-        return True
-    return False
+    if not ct.islower():
+        ct = ct.lower()
+    return ct.startswith(MEDIA_PREFIXES) or ct in ALLOWED_DOC_CT
 
 # ========== Coleta/Persistência de anexos ==========
 
+def _fetch_conv_attachment(job: Dict[str, Any], max_bytes: int, max_mb: int,
+                           session: requests.Session) -> Optional[Tuple[Optional[int], str, Optional[str]]]:
+    """
+    Baixa um anexo de conversa para job["part"] (ou, sem pasta, só lê os headers).
+    Roda nas threads do executor. Retorna (tamanho, content-type, sha256) ou None
+    se o anexo foi descartado/falhou (o motivo já vai para o log de erros).
+    """
+    tid, conv_id, name, url = job["tid"], job["conv_id"], job["name"], job["url"]
+    ct = job["ct"]
+    size = job["size"]
+    digest = None
+    try:
+        if job["cached"]:
+            # já baixado numa execução anterior (mesmo nome e tamanho): só recalcula o hash
+            return size, ct, file_sha256(job["dest"])
+        if job["part"] is not None:
+            digest, size, rct = download_and_hash(url, job["part"], max_bytes=max_bytes, session=session)
+            if digest is None:
+                log_error("attachment_skipped_too_large", tid, conv_id=conv_id, name=name, url=url, size=size)
+                print(f"[warn] pulo anexo > {max_mb}MB: {url}", file=sys.stderr)
+                return None
+            ct = rct or ct
+        else:
+            # só os headers interessam: o corpo não é lido e a conexão volta ao pool no fim do with
+            with session.get(url, timeout=30, stream=True) as rr:
+                rr.raise_for_status()
+                if not size:
+                    try:
+                        size = int(rr.headers.get("Content-Length") or 0) or None
+                    except Exception:
+                        size = None
+                ct = rr.headers.get("Content-Type", ct)
+    except requests.HTTPError as he:
+        code = he.response.status_code if he.response is not None else None
+        log_error("conv_attachment_download_failed", tid, conv_id=conv_id, name=name, url=url, http_status=code)
+        print(f"[warn] conv attachment download falhou: {he}", file=sys.stderr)
+        return None
+    except Exception as e:
+        log_error("conv_attachment_download_failed", tid, conv_id=conv_id, name=name, url=url, err=str(e))
+        print(f"[warn] conv attachment download falhou: {e}", file=sys.stderr)
+        return None
+    return size, ct, digest
+
 def collect_conversation_attachments(ticket: Dict[str, Any], max_mb: int, download_dir: Optional[str],
-                                     min_kb: int, attach_signature_block: bool = True) -> List[Dict[str, Any]]:
+                                     min_kb: int, attach_signature_block: bool = True,
+                                     executor: Optional[ThreadPoolExecutor] = None,
+                                     session: Optional[requests.Session] = None) -> List[Dict[str, Any]]:
     out: List[Dict[str, Any]] = []
     convs = ticket.get("conversations") or []
     max_bytes = max_mb * 1024 * 1024
@@ -888,6 +1418,8 @@ def collect_conversation_attachments(ticket: Dict[str, Any], max_mb: int, downlo
     if base_dir:
         base_dir = base_dir / str(tid)
 
+    # 1) filtros que não dependem de rede
+    jobs: List[Dict[str, Any]] = []
     for c in convs:
         conv_id = c.get("id")
         atts = c.get("attachments") or []
@@ -910,130 +1442,152 @@ def collect_conversation_attachments(ticket: Dict[str, Any], max_mb: int, downlo
                 log_error("attachment_skipped_content_type", tid, conv_id=conv_id, name=name, url=url, content_type=ct)
                 continue
 
-            content = None
-            size = size_guess
-            try:
-                if base_dir:
-                    rr = requests.get(url, timeout=120)
-                    rr.raise_for_status()
-                    content = rr.content
-                    size = len(content)
-                    if size and size > max_bytes:
-                        log_error("attachment_skipped_too_large", tid, conv_id=conv_id, name=name, url=url, size=size)
-                        print(f"[warn] pulo anexo > {max_mb}MB: {url}", file=sys.stderr)
-                        continue
-                    ct = rr.headers.get("Content-Type", ct)
-                else:
-                    rr = requests.get(url, timeout=30, stream=True)
-                    rr.raise_for_status()
-                    if not size:
-                        try:
-                            size = int(rr.headers.get("Content-Length") or 0) or None
-                        except Exception:
-                            size = None
-                    ct = rr.headers.get("Content-Type", ct)
-            except requests.HTTPError as he:
-                code = he.response.status_code if he.response is not None else None
-                log_error("conv_attachment_download_failed", tid, conv_id=conv_id, name=name, url=url, http_status=code)
-                print(f"[warn] conv attachment download falhou: {he}", file=sys.stderr)
-                continue
-            except Exception as e:
-                log_error("conv_attachment_download_failed", tid, conv_id=conv_id, name=name, url=url, err=str(e))
-                print(f"[warn] conv attachment download falhou: {e}", file=sys.stderr)
-                continue
+            # arquivo de uma execução anterior com o tamanho informado pelo Freshdesk: reaproveita sem baixar
+            dest = (base_dir / name) if base_dir else None
+            cached = False
+            if dest is not None and size_guess and size_guess <= max_bytes:
+                try:
+                    cached = dest.stat().st_size == size_guess
+                except OSError:
+                    cached = False
+
+            jobs.append({
+                "tid": tid, "conv_id": conv_id, "name": name, "url": url, "ct": ct, "size": size_guess,
+                "dest": dest, "cached": cached,
+                # .part único por anexo (nomes podem se repetir no ticket); renomeado só depois dos filtros
+                "part": (base_dir / f"{name}.{len(jobs)}.part") if (base_dir and not cached) else None,
+            })
 
-            if size is not None and size < min_bytes:
-                log_error("attachment_skipped_too_small", tid, conv_id=conv_id, name=name, url=url, size=size)
-                continue
+    # 2) downloads em paralelo; resultados consumidos na ordem original
+    if base_dir and jobs:
+        ensure_dir(base_dir)
+    session = session or _DOWNLOAD_SESSION
+    results = executor.map(lambda j: _fetch_conv_attachment(j, max_bytes, max_mb, session), jobs) if executor \
+        else (_fetch_conv_attachment(j, max_bytes, max_mb, session) for j in jobs)
+
+    # um único carimbo por ticket: os anexos chegam em poucos segundos
+    stored_at_now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S") if base_dir and jobs else None
+    for job, res in zip(jobs, results):
+        if res is None:
+            continue
+        size, ct, digest = res
+        part = job["part"]
+        name, url, conv_id = job["name"], job["url"], job["conv_id"]
+
+        if size is not None and size < min_bytes:
+            if part is not None:
+                part.unlink(missing_ok=True)
+            log_error("attachment_skipped_too_small", tid, conv_id=conv_id, name=name, url=url, size=size)
+            continue
 
-            stored_url = None
-            stored_at = None
-            digest = None
-            if base_dir and content is not None:
-                dest = base_dir / name
-                ensure_dir(dest.parent)
-                save_bytes(dest, content)
-                stored_url = str(dest)
-                stored_at = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-                digest = sha256_bytes(content)
-
-            out.append({
-                "name": name,
-                "content_type": ct,
-                "size_bytes": size,
-                "fresh_url": url,
-                "fresh_url_expires_at": None,
-                "stored_url": stored_url,
-                "stored_at": stored_at,
-                "sha256": digest,
-                "conv_id": conv_id,
-            })
+        stored_url = None
+        stored_at = None
+        if part is not None or job["cached"]:
+            dest = job["dest"]
+            if part is not None:
+                os.replace(part, dest)
+            stored_url = str(dest)
+            stored_at = stored_at_now
+
+        out.append({
+            "name": name,
+            "content_type": ct,
+            "size_bytes": size,
+            "fresh_url": url,
+            "fresh_url_expires_at": None,
+            "stored_url": stored_url,
+            "stored_at": stored_at,
+            "sha256": digest,
+            "conv_id": conv_id,
+        })
     return out
 
+def _fetch_inline(job: Dict[str, Any], min_bytes: int, session: requests.Session) -> Optional[Dict[str, Any]]:
+    """
+    Baixa uma imagem inline para job["dest"]. Roda nas threads do executor.
+    Retorna os campos de armazenamento ou None se foi descartada/falhou (já logado).
+    """
+    ticket_id, url, name = job["ticket_id"], job["url"], job["name"]
+    dest = job["dest"]
+    part = dest.with_name(dest.name + ".part")
+    try:
+        # streaming para .part com hash na mesma passada; só vira arquivo final se passar nos filtros
+        digest, size, ctype = download_and_hash(url, part, session=session, content_type_ok=content_type_allowed)
+        if digest is None:
+            log_error("inline_skipped_content_type", ticket_id, url=url, name=name, content_type=ctype)
+            return None
+        if size is not None and size < min_bytes:
+            part.unlink(missing_ok=True)
+            log_error("inline_skipped_too_small", ticket_id, url=url, name=name, size=size)
+            return None
+        os.replace(part, dest)
+        return {
+            "content_type": ctype,
+            "size_bytes": size,
+            "stored_url": str(dest),
+            "sha256": digest,
+        }
+    except requests.HTTPError as he:
+        code = he.response.status_code if he.response is not None else None
+        log_error("inline_download_failed", ticket_id, url=url, name=name, http_status=code)
+        print(f"[warn] falha ao baixar inline: {he}", file=sys.stderr)
+    except Exception as e:
+        log_error("inline_download_failed", ticket_id, url=url, name=name, err=str(e))
+        print(f"[warn] falha ao baixar inline: {e}", file=sys.stderr)
+    return None
+
 def collect_inline_from_description(html: Optional[str], ticket_id: Optional[int], download_dir: Optional[str],
-                                    min_kb: int, block_hosts: List[str]) -> List[Dict[str, Any]]:
+                                    min_kb: int, block_hosts: List[str],
+                                    executor: Optional[ThreadPoolExecutor] = None,
+                                    session: Optional[requests.Session] = None) -> List[Dict[str, Any]]:
     out: List[Dict[str, Any]] = []
-    if not html:
+    # toda URL casada por INLINE_RE contém "://": sem isso (o caso comum) nem roda a regex
+    if not html or "://" not in html:
         return out
 
     base_dir = Path(download_dir) / str(ticket_id) if (download_dir and ticket_id) else None
     min_bytes = max(0, min_kb) * 1024
+    block_re = block_hosts_re(tuple(block_hosts))
 
+    jobs: List[Dict[str, Any]] = []
     for idx, url in enumerate(INLINE_RE.findall(html), 1):
         name = url.split("/")[-1].split("?")[0] or f"inline_{idx}"
         name = f"inline_{idx}_{safe_filename(name)}"
-        host = hostname(url)
 
-        url_l = url.lower()
-        blocked = any(b in url_l for b in block_hosts) or is_signature_like(name, url)
+        blocked = (block_re is not None and block_re.search(url) is not None) or is_signature_like(name, url)
         if blocked:
-            log_error("inline_blocked_by_pattern", ticket_id, url=url, name=name, host=host)
+            # host só serve para o log: urlparse apenas nas URLs bloqueadas
+            log_error("inline_blocked_by_pattern", ticket_id, url=url, name=name, host=hostname(url))
             continue
 
-        stored_url = None
-        stored_at = None
-        digest = None
-        size = None
-        ctype = None
+        # nomes já são únicos (prefixo inline_<idx>), então cada download grava direto no destino
+        jobs.append({"ticket_id": ticket_id, "url": url, "name": name,
+                     "dest": (base_dir / name) if base_dir else None})
 
-        if base_dir:
-            try:
-                rr = requests.get(url, timeout=120)
-                rr.raise_for_status()
-                content = rr.content
-                size = len(content)
-                if size is not None and size < min_bytes:
-                    log_error("inline_skipped_too_small", ticket_id, url=url, name=name, size=size)
-                    continue
-                ctype = rr.headers.get("Content-Type")
-                if not content_type_allowed(ctype):
-                    log_error("inline_skipped_content_type", ticket_id, url=url, name=name, content_type=ctype)
-                    continue
-                dest = base_dir / name
-                ensure_dir(dest.parent)
-                save_bytes(dest, content)
-                stored_url = str(dest)
-                stored_at = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-                digest = sha256_bytes(content)
-            except requests.HTTPError as he:
-                code = he.response.status_code if he.response is not None else None
-                log_error("inline_download_failed", ticket_id, url=url, name=name, http_status=code)
-                print(f"[warn] falha ao baixar inline: {he}", file=sys.stderr)
-                continue
-            except Exception as e:
-                log_error("inline_download_failed", ticket_id, url=url, name=name, err=str(e))
-                print(f"[warn] falha ao baixar inline: {e}", file=sys.stderr)
-                continue
+    if base_dir:
+        if jobs:
+            ensure_dir(base_dir)
+        session = session or _DOWNLOAD_SESSION
+        results = executor.map(lambda j: _fetch_inline(j, min_bytes, session), jobs) if executor \
+            else (_fetch_inline(j, min_bytes, session) for j in jobs)
+    else:
+        # sem pasta de download: só metadados, nenhuma requisição
+        results = ({} for _ in jobs)
 
+    # um único carimbo por ticket, aplicado só às imagens gravadas em disco
+    stored_at = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S") if base_dir and jobs else None
+    for job, stored in zip(jobs, results):
+        if stored is None:
+            continue
         out.append({
-            "name": name,
-            "content_type": ctype,
-            "size_bytes": size,
-            "fresh_url": url,
+            "name": job["name"],
+            "content_type": stored.get("content_type"),
+            "size_bytes": stored.get("size_bytes"),
+            "fresh_url": job["url"],
             "fresh_url_expires_at": None,
-            "stored_url": stored_url,
-            "stored_at": stored_at,
-            "sha256": digest,
+            "stored_url": stored.get("stored_url"),
+            "stored_at": stored_at if stored.get("stored_url") else None,
+            "sha256": stored.get("sha256"),
             "conv_id": None,
         })
     return out
@@ -1048,6 +1602,14 @@ def persist_tickets(db: MySQL, rows: List[Dict[str, Any]]):
 def persist_attachments(db: MySQL, ticket_id: int, atts: List[Dict[str, Any]], conv_to_msg: Dict[int, int]):
     if not atts:
         return
+    persist_attachment_rows(db, build_attachment_rows(ticket_id, atts, conv_to_msg))
+
+def persist_attachment_rows(db: MySQL, rows: List[Dict[str, Any]]):
+    if not rows:
+        return
+    db.exec_many(ATTACH_UPSERT_SQL, rows)
+
+def build_attachment_rows(ticket_id: int, atts: List[Dict[str, Any]], conv_to_msg: Dict[int, int]) -> List[Dict[str, Any]]:
     rows = []
     for a in atts:
         conv_id = a.get("conv_id")
@@ -1064,7 +1626,7 @@ def persist_attachments(db: MySQL, ticket_id: int, atts: List[Dict[str, Any]], c
             "stored_at": a.get("stored_at"),
             "sha256": a.get("sha256"),
         })
-    db.exec_many(ATTACH_UPSERT_SQL, rows)
+    return rows
 
 def persist_agents(db: MySQL, rows: List[Dict[str, Any]]):
     if not rows:
@@ -1087,18 +1649,154 @@ def persist_contacts(db: MySQL, rows: List[Dict[str, Any]]):
     db.exec_many(CONTACT_UPSERT_SQL, rows)
 
 def persist_messages_return_map(db: MySQL, rows: List[Dict[str, Any]]) -> Dict[int, int]:
-    conv_to_msg: Dict[int, int] = {}
     if not rows:
-        return conv_to_msg
-    for r in rows:
-        msg_id = db.exec_one_returning_id(MESSAGE_UPSERT_SQL, r)
-        conv_id = r.get("freshdesk_conv_id")
-        if conv_id is not None and msg_id:
-            conv_to_msg[int(conv_id)] = int(msg_id)
-    return conv_to_msg
+        return {}
+    return db.exec_many_returning_ids(MESSAGE_UPSERT_SQL, rows, "messages", "id", "freshdesk_conv_id")
 
 # ========== Orquestração ==========
 
+def fetch_ticket_bundle(
+    tid: int,
+    domain: str,
+    api_key: str,
+    octa_lookup: bool = False,
+    octa_url: Optional[str] = None,
+    octa_key: Optional[str] = None,
+    octa_agent_email_hdr: Optional[str] = None,
+    octa_contact_cf_key: Optional[str] = None,
+    octa_org_cf_key: Optional[str] = None,
+    octa_timeout: int = 60,
+) -> Dict[str, Any]:
+    """
+    Toda a parte HTTP de um ticket (roda nas threads de prefetch): ticket completo,
+    grupo, agente, contato, empresa e lookups no Octa. Não toca no banco.
+    Falha no GET do ticket propaga; as demais viram None + log_error, como antes.
+    """
+    full = fd_get_ticket(domain, api_key, tid)
+    bundle: Dict[str, Any] = {
+        "ticket": full,
+        "group": None,
+        "agent": None,
+        "contact": None,
+        "company": None,
+        "octa_contact_id": None,
+        "octa_company_id": None,
+    }
+
+    # ---- b_groups
+    g_id = full.get("group_id")
+    if g_id:
+        bundle["group"] = fd_get_group(domain, api_key, int(g_id))
+
+    # ---- agents
+    a_id = full.get("responder_id")
+    if a_id:
+        bundle["agent"] = fd_get_agent(domain, api_key, int(a_id))
+
+    # ---- contacts + companies (+ Octa lookup)
+    r_id = full.get("requester_id")
+    octa_contact_id: Optional[str] = None
+    octa_company_id: Optional[str] = None
+
+    if r_id:
+        ct = None
+        try:
+            ct = fd_get_contact(domain, api_key, int(r_id))
+        except Exception:
+            ct = None
+        if not ct:
+            log_error("contact_not_found", tid, contact_id=r_id)
+        else:
+            comp_id = ct.get("company_id")
+            comp_json = None
+            if comp_id:
+                comp_json = fd_get_company(domain, api_key, int(comp_id))
+
+            if octa_lookup and octa_url and octa_key:
+                try:
+                    octa_ct = octa_find_contact(
+                        api_url=octa_url,
+                        api_key=octa_key,
+                        agent_email=octa_agent_email_hdr,
+                        email=ct.get("email"),
+                        fresh_contact_id=ct.get("id"),
+                        cf_key=octa_contact_cf_key,
+                        timeout=octa_timeout,
+                    )
+                    if octa_ct:
+                        octa_contact_id = str(octa_ct.get("id")) if octa_ct.get("id") is not None else None
+                        org_in_ct = octa_ct.get("organization") or {}
+                        if isinstance(org_in_ct, dict) and org_in_ct.get("id") is not None:
+                            octa_company_id = str(org_in_ct.get("id"))
+                    else:
+                        log_error("octa_contact_not_found", tid, contact_fresh_id=ct.get("id"), email=ct.get("email"))
+
+                    # tentar org só se ainda não veio do contato e se o ambiente aceitar filtros
+                    if not octa_company_id and comp_json:
+                        octa_org = octa_find_organization(
+                            api_url=octa_url,
+                            api_key=octa_key,
+                            agent_email=octa_agent_email_hdr,
+                            name=(comp_json.get("name") if isinstance(comp_json, dict) else None),
+                            fresh_company_id=(comp_json.get("id") if isinstance(comp_json, dict) else None),
+                            cf_key=octa_org_cf_key,
+                            timeout=octa_timeout,
+                        )
+                        if octa_org and octa_org.get("id") is not None:
+                            octa_company_id = str(octa_org.get("id"))
+                        elif comp_json:
+                            log_error("octa_org_not_found", tid, company_fresh_id=comp_json.get("id"), company_name=comp_json.get("name"))
+                except Exception as e:
+                    log_error("octa_lookup_failed", tid, err=str(e))
+
+            bundle["contact"] = ct
+            bundle["company"] = comp_json if isinstance(comp_json, dict) else None
+
+    bundle["octa_contact_id"] = octa_contact_id
+    bundle["octa_company_id"] = octa_company_id
+    return bundle
+
+# buffers de grupos/agentes/empresas/contatos: descarregados a cada
+# PENDING_FLUSH_TICKETS tickets, quando algum passa de PENDING_FLUSH_ROWS linhas, e no fim
+PENDING_FLUSH_ROWS = 500
+PENDING_FLUSH_TICKETS = 50
+# tickets gravados em lotes de TICKET_FLUSH_ROWS (--batch-size); mensagens e anexos do lote ficam na
+# fila e vão logo depois dos tickets (FKs). TICKET_FLUSH_MESSAGES limita a fila de mensagens.
+TICKET_FLUSH_ROWS = 200
+TICKET_FLUSH_MESSAGES = 2000
+
+def write_entity_batch(db: MySQL, groups: List[Dict[str, Any]], agents: List[Dict[str, Any]],
+                       companies: List[Dict[str, Any]], contacts: List[Dict[str, Any]]):
+    with db.transaction():
+        persist_groups(db, groups)
+        persist_agents(db, agents)
+        persist_companies(db, companies)
+        persist_contacts(db, contacts)
+
+def write_ticket_batch(db: MySQL, tickets: List[Dict[str, Any]], messages: List[Dict[str, Any]],
+                       ticket_atts: List[Tuple[int, List[Dict[str, Any]]]]):
+    # ordem (FKs): tickets do lote, depois as mensagens deles (um upsert só), depois os anexos;
+    # tudo numa transação só: um commit por lote em vez de um por tabela
+    with db.transaction():
+        persist_tickets(db, tickets)
+        conv_to_msg = persist_messages_return_map(db, messages)
+        att_rows: List[Dict[str, Any]] = []
+        for att_tid, atts in ticket_atts:
+            att_rows.extend(build_attachment_rows(att_tid, atts, conv_to_msg))
+        persist_attachment_rows(db, att_rows)
+
+def fetch_stored_updated_at(db: MySQL, ticket_ids: List[int], chunk_size: int = 1000) -> Dict[int, str]:
+    """updated_at_fd já gravado por ticket (formato de parse_dt), em SELECTs de até chunk_size ids."""
+    out: Dict[int, str] = {}
+    for i in range(0, len(ticket_ids), chunk_size):
+        chunk = ticket_ids[i:i + chunk_size]
+        sql = _select_in_sql("tickets", ("freshdesk_ticket_id", "updated_at_fd"), "freshdesk_ticket_id", len(chunk))
+        for tid, upd in db.fetch_all(sql, chunk):
+            if upd is None:
+                continue
+            out[int(tid)] = upd.strftime("%Y-%m-%d %H:%M:%S") if isinstance(upd, datetime) else str(upd)
+    return out
+
 def sync_tickets(
     domain: str,
     api_key: str,
@@ -1126,167 +1824,205 @@ def sync_tickets(
     octa_timeout: int = 60,
     # anexos
     attach_signature_block: bool = True,
+    # incremental
+    skip_unchanged: bool = False,
+    # paralelismo
+    workers: int = 8,
+    attach_executor: Optional[ThreadPoolExecutor] = None,
+    batch_size: int = TICKET_FLUSH_ROWS,
 ):
+    # caches valem por execução: uma segunda chamada no mesmo processo não reaproveita dados velhos
+    clear_lookup_caches()
+
     # 1) IDs alvo
     if ticket_ids:
-        found_ids = list(dict.fromkeys(int(t) for t in ticket_ids))
+        found_ids = []
+        seen_ids: set = set()
+        for t in ticket_ids:
+            i = int(t)
+            if i not in seen_ids:
+                seen_ids.add(i)
+                found_ids.append(i)
         print(f"[info] Tickets (IDs diretos): {len(found_ids)}")
     else:
         found_ids: List[int] = []
+        # a paginação por updated_at pode repetir um ticket alterado durante a listagem
+        seen_ids: set = set()
         api_updated_since = None
-        if updated_from:
-            api_updated_since = updated_from.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
-        elif updated_since:
-            api_updated_since = updated_since
+        since_dt = updated_from
+        if not since_dt and updated_since:
+            since_dt = parse_dt_obj(updated_since)
+            if not since_dt:
+                api_updated_since = updated_since
+        # criado depois de X implica atualizado depois de X: created_from também
+        # limita a listagem no servidor (ticket_in_period continua como filtro final)
+        if created_from and (not since_dt or created_from > since_dt):
+            since_dt = created_from
+        if since_dt:
+            api_updated_since = since_dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        listed_updated: Dict[int, Optional[str]] = {}
         for t in fd_paginate_tickets(domain, api_key, per_page=page_size, page_start=1, updated_since=api_updated_since):
             if ticket_in_period(t, created_from, created_to, updated_from, updated_to):
-                if "id" in t:
+                if "id" in t and int(t["id"]) not in seen_ids:
+                    seen_ids.add(int(t["id"]))
                     found_ids.append(int(t["id"]))
+                    listed_updated[int(t["id"])] = parse_dt(t.get("updated_at"))
         if not found_ids:
             print("[info] Nenhum ticket encontrado no período/filtro informado.")
             return
         print(f"[info] Tickets listados: {len(found_ids)}")
 
+        # incremental: ticket cujo updated_at da listagem já está no banco não é rebaixado
+        if skip_unchanged:
+            stored = fetch_stored_updated_at(db, found_ids)
+            before = len(found_ids)
+            found_ids = [tid for tid in found_ids
+                         if not listed_updated.get(tid) or stored.get(tid) != listed_updated[tid]]
+            print(f"[info] Tickets sem alteração desde a última carga (pulados): {before - len(found_ids)}")
+            if not found_ids:
+                return
+
     if inline_block_hosts is None:
         inline_block_hosts = list(DEFAULT_INLINE_BLOCKLIST)
 
     # 2) Processa
+    # toda a parte HTTP (ticket, entidades, Octa) roda em paralelo; a gravação no banco segue sequencial e em ordem
     batch_rows: List[Dict[str, Any]] = []
-    for idx, tid in enumerate(found_ids, 1):
-        try:
-            full = fd_get_ticket(domain, api_key, tid)
-        except Exception as e:
-            log_error("ticket_fetch_failed", tid, err=str(e))
-            print(f"[warn] erro ao buscar ticket {tid}: {e}", file=sys.stderr)
-            continue
+    # filhos dos tickets em batch_rows: só gravados depois do lote de tickets
+    pending_messages: List[Dict[str, Any]] = []
+    pending_ticket_atts: List[Tuple[int, List[Dict[str, Any]]]] = []
+    pending_groups: List[Dict[str, Any]] = []
+    pending_agents: List[Dict[str, Any]] = []
+    pending_companies: List[Dict[str, Any]] = []
+    pending_contacts: List[Dict[str, Any]] = []
+    # entidades já enfileiradas nesta execução: a mesma linha não é montada/gravada de novo
+    seen_group_ids: set = set()
+    seen_agent_ids: set = set()
+    # empresa -> octa_company_id já gravado (pode vir só pelo contato de um ticket posterior)
+    seen_companies: Dict[Any, Optional[str]] = {}
+    seen_contact_ids: set = set()
+
+    # gravação no banco numa thread própria: o lote N é gravado enquanto o lote N+1 é
+    # buscado/montado. Uma gravação em voo por vez (ordem e FKs preservadas, memória limitada
+    # a dois lotes); um erro na gravação aparece no próximo submit ou no fim.
+    db_writer = ThreadPoolExecutor(max_workers=1)
+    last_write: List[Future] = []
+
+    def submit_write(fn, *bufs):
+        if last_write:
+            last_write.pop().result()
+        last_write.append(db_writer.submit(fn, db, *(list(b) for b in bufs)))
+        for b in bufs:
+            b.clear()
+
+    def flush_pending():
+        if not (pending_groups or pending_agents or pending_companies or pending_contacts):
+            return
+        submit_write(write_entity_batch, pending_groups, pending_agents, pending_companies, pending_contacts)
 
-        # ---- Ticket
-        row = build_ticket_row(full)
-        batch_rows.append(row)
+    def flush_tickets():
+        if not batch_rows:
+            return
+        submit_write(write_ticket_batch, batch_rows, pending_messages, pending_ticket_atts)
 
-        # persist ticket antes de messages/attachments (FKs)
-        if include_inline or inline_scrape:
-            if batch_rows:
-                persist_tickets(db, batch_rows)
-                batch_rows = []
-        else:
-            if len(batch_rows) >= 200:
-                persist_tickets(db, batch_rows)
-                batch_rows = []
-
-        # ---- b_groups
-        g_id = full.get("group_id")
-        if g_id:
-            g = fd_get_group(domain, api_key, int(g_id))
-            if g:
-                persist_groups(db, [build_group_row(g)])
-
-        # ---- agents
-        a_id = full.get("responder_id")
-        if a_id:
-            a = fd_get_agent(domain, api_key, int(a_id))
-            if a:
-                persist_agents(db, [build_agent_row(a)])
-
-        # ---- contacts + companies (+ Octa lookup)
-        r_id = full.get("requester_id")
-        octa_contact_id: Optional[str] = None
-        octa_company_id: Optional[str] = None
-
-        if r_id:
-            ct = None
-            try:
-                ct = fd_get_contact(domain, api_key, int(r_id))
-            except Exception:
-                ct = None
-            if not ct:
-                log_error("contact_not_found", tid, contact_id=r_id)
-            else:
-                comp_id = ct.get("company_id")
-                comp_json = None
-                if comp_id:
-                    comp_json = fd_get_company(domain, api_key, int(comp_id))
+    fetch = functools.partial(
+        fetch_ticket_bundle,
+        domain=domain,
+        api_key=api_key,
+        octa_lookup=octa_lookup,
+        octa_url=octa_url,
+        octa_key=octa_key,
+        octa_agent_email_hdr=octa_agent_email_hdr,
+        octa_contact_cf_key=octa_contact_cf_key,
+        octa_org_cf_key=octa_org_cf_key,
+        octa_timeout=octa_timeout,
+    )
+    try:
+        prefetched = prefetch_ordered(fetch, found_ids, workers=workers)
+        for idx, (tid, bundle, fetch_err) in enumerate(prefetched, 1):
+            if fetch_err is not None:
+                log_error("ticket_fetch_failed", tid, err=str(fetch_err))
+                print(f"[warn] erro ao buscar ticket {tid}: {fetch_err}", file=sys.stderr)
+                continue
 
-                if octa_lookup and octa_url and octa_key:
-                    try:
-                        octa_ct = octa_find_contact(
-                            api_url=octa_url,
-                            api_key=octa_key,
-                            agent_email=octa_agent_email_hdr,
-                            email=ct.get("email"),
-                            fresh_contact_id=ct.get("id"),
-                            cf_key=octa_contact_cf_key,
-                            timeout=octa_timeout,
-                        )
-                        if octa_ct:
-                            octa_contact_id = str(octa_ct.get("id")) if octa_ct.get("id") is not None else None
-                            org_in_ct = octa_ct.get("organization") or {}
-                            if isinstance(org_in_ct, dict) and org_in_ct.get("id") is not None:
-                                octa_company_id = str(org_in_ct.get("id"))
-                        else:
-                            log_error("octa_contact_not_found", tid, contact_fresh_id=ct.get("id"), email=ct.get("email"))
-
-                        # tentar org só se ainda não veio do contato e se o ambiente aceitar filtros
-                        if not octa_company_id and comp_json:
-                            octa_org = octa_find_organization(
-                                api_url=octa_url,
-                                api_key=octa_key,
-                                agent_email=octa_agent_email_hdr,
-                                name=(comp_json.get("name") if isinstance(comp_json, dict) else None),
-                                fresh_company_id=(comp_json.get("id") if isinstance(comp_json, dict) else None),
-                                cf_key=octa_org_cf_key,
-                                timeout=octa_timeout,
-                            )
-                            if octa_org and octa_org.get("id") is not None:
-                                octa_company_id = str(octa_org.get("id"))
-                            elif comp_json:
-                                log_error("octa_org_not_found", tid, company_fresh_id=comp_json.get("id"), company_name=comp_json.get("name"))
-                    except Exception as e:
-                        log_error("octa_lookup_failed", tid, err=str(e))
-
-                if comp_json and isinstance(comp_json, dict):
+            full = bundle["ticket"]
+
+            # ---- Ticket
+            batch_rows.append(build_ticket_row(full))
+
+            # ---- b_groups / agents
+            g = bundle["group"]
+            if g and g.get("id") not in seen_group_ids:
+                seen_group_ids.add(g.get("id"))
+                pending_groups.append(build_group_row(g))
+            a = bundle["agent"]
+            if a and a.get("id") not in seen_agent_ids:
+                seen_agent_ids.add(a.get("id"))
+                pending_agents.append(build_agent_row(a))
+
+            # ---- contacts + companies (Octa ids já resolvidos no prefetch)
+            ct = bundle["contact"]
+            if ct:
+                comp_json = bundle["company"]
+                comp_key = comp_json.get("id") if comp_json else None
+                if comp_json and (comp_key not in seen_companies
+                                  or (bundle["octa_company_id"] and not seen_companies[comp_key])):
+                    seen_companies[comp_key] = bundle["octa_company_id"]
                     comp_row = build_company_row(comp_json)
-                    if octa_company_id:
-                        comp_row["octa_company_id"] = octa_company_id
-                    persist_companies(db, [comp_row])
-
-                ct_row = build_contact_row(ct)
-                if octa_contact_id:
-                    ct_row["octa_contact_id"] = octa_contact_id
-                persist_contacts(db, [ct_row])
-
-        # ---- messages
-        convs = full.get("conversations") or []
-        msg_rows = [build_message_row(c, ticket_id=tid) for c in convs if c.get("id")]
-        conv_to_msg: Dict[int, int] = {}
-        if msg_rows:
-            conv_to_msg = persist_messages_return_map(db, msg_rows)
-
-        # ---- attachments
-        if include_inline or inline_scrape:
-            atts = collect_conversation_attachments(
-                full,
-                max_mb=max_mb,
-                download_dir=download_dir,
-                min_kb=min_attach_kb,
-                attach_signature_block=attach_signature_block
-            )
-            if inline_scrape:
-                atts += collect_inline_from_description(
-                    full.get("description"),
-                    ticket_id=tid,
+                    if bundle["octa_company_id"]:
+                        comp_row["octa_company_id"] = bundle["octa_company_id"]
+                    pending_companies.append(comp_row)
+
+                if ct.get("id") not in seen_contact_ids:
+                    seen_contact_ids.add(ct.get("id"))
+                    ct_row = build_contact_row(ct)
+                    if bundle["octa_contact_id"]:
+                        ct_row["octa_contact_id"] = bundle["octa_contact_id"]
+                    pending_contacts.append(ct_row)
+
+            # ---- messages (gravadas junto com o lote de tickets)
+            convs = full.get("conversations") or []
+            if convs:
+                pending_messages.extend(build_message_row(c, ticket_id=tid) for c in convs if c.get("id"))
+
+            # ---- attachments
+            if include_inline or inline_scrape:
+                atts = collect_conversation_attachments(
+                    full,
+                    max_mb=max_mb,
                     download_dir=download_dir,
                     min_kb=min_attach_kb,
-                    block_hosts=inline_block_hosts
+                    attach_signature_block=attach_signature_block,
+                    executor=attach_executor,
                 )
-            if atts:
-                persist_attachments(db, tid, atts, conv_to_msg)
-
-        if idx % 50 == 0:
-            print(f"[info] Processados {idx}/{len(found_ids)} tickets...")
-
-    if batch_rows:
-        persist_tickets(db, batch_rows)
+                if inline_scrape:
+                    atts += collect_inline_from_description(
+                        full.get("description"),
+                        ticket_id=tid,
+                        download_dir=download_dir,
+                        min_kb=min_attach_kb,
+                        block_hosts=inline_block_hosts,
+                        executor=attach_executor,
+                    )
+                if atts:
+                    pending_ticket_atts.append((tid, atts))
+
+            if idx % PENDING_FLUSH_TICKETS == 0 or max(
+                    len(pending_groups), len(pending_agents), len(pending_companies),
+                    len(pending_contacts)) >= PENDING_FLUSH_ROWS:
+                flush_pending()
+            if len(batch_rows) >= batch_size or len(pending_messages) >= TICKET_FLUSH_MESSAGES:
+                flush_tickets()
+
+            if idx % 50 == 0:
+                print(f"[info] Processados {idx}/{len(found_ids)} tickets...")
+
+        flush_pending()
+        flush_tickets()
+        if last_write:
+            last_write.pop().result()
+    finally:
+        db_writer.shutdown(wait=True)
 
     print("[ok] Sincronização concluída.")
 
@@ -1327,6 +2063,15 @@ def parse_args():
     # **NOVO**: não bloquear anexos por assinatura/logo
     p.add_argument("--no-attach-signature-block", dest="no_attach_signature_block", action="store_true")
 
+    # tickets buscados em paralelo no Freshdesk
+    p.add_argument("--workers", dest="workers", type=int, default=8)
+    # pula tickets cujo updated_at já está gravado (só na listagem por período)
+    p.add_argument("--skip-unchanged", dest="skip_unchanged", action="store_true")
+    # downloads de anexos simultâneos
+    p.add_argument("--attach-workers", dest="attach_workers", type=int, default=16)
+    # tickets por lote gravado (tickets + mensagens + anexos numa transação)
+    p.add_argument("--batch-size", dest="batch_size", type=int, default=TICKET_FLUSH_ROWS)
+
     return p.parse_args()
 
 def main():
@@ -1340,6 +2085,11 @@ def main():
     mysql_db   = (args.mysql_db or env_or("MYSQL_DB", "MYSQL_DATABASE"))
     mysql_user = args.mysql_user or env_or("MYSQL_USER", default="root")
     mysql_pass = args.mysql_pass or env_or("MYSQL_PASS", "MYSQL_PASSWORD", default="")
+    # o mysql-connector aceita no máximo 32 conexões por pool
+    try:
+        mysql_pool_size = max(1, min(32, int(env_or("MYSQL_POOL_SIZE", default="5"))))
+    except ValueError:
+        mysql_pool_size = 5
 
     include_inline_default = env_bool("INCLUDE_INLINE_ATTACHMENTS", default=False)
     inline_scrape_default  = env_bool("INCLUDE_HTML_INLINE_SCRAPE", default=False)
@@ -1365,14 +2115,14 @@ def main():
         sys.exit(2)
 
     ids: List[int] = []
-    if args.ticket_id:
-        ids.extend(args.ticket_id)
+    seen_ids: set = set()
+    raw_ids = list(args.ticket_id or [])
     if args.ticket_ids:
-        for x in args.ticket_ids.split(","):
-            x = x.strip()
-            if x.isdigit():
-                ids.append(int(x))
-    ids = list(dict.fromkeys(ids))
+        raw_ids.extend(int(x.strip()) for x in args.ticket_ids.split(",") if x.strip().isdigit())
+    for i in raw_ids:
+        if i not in seen_ids:
+            seen_ids.add(i)
+            ids.append(i)
 
     page_size = max(1, min(100, args.page_size))
 
@@ -1385,7 +2135,7 @@ def main():
         user=mysql_user,
         password=mysql_pass,
         database=mysql_db,
-        pool_size=5,
+        pool_size=mysql_pool_size,
     )
 
     # Octa setup
@@ -1399,38 +2149,49 @@ def main():
     if (not args.no_octa_lookup) and not octa_lookup_enabled:
         print("[info] Lookup no Octa desativado (faltam OCTADESK_BASE_URL, OCTADESK_API_KEY ou OCTADESK_AGENT_EMAIL).")
 
-    # Run
-    sync_tickets(
-        domain=fd_domain,
-        api_key=fd_key,
-        db=db,
-        updated_since=args.updated_since,
-        include_inline=include_inline,
-        inline_scrape=inline_scrape,
-        max_mb=args.max_attach_mb,
-        page_size=page_size,
-        ticket_ids=ids if ids else None,
-        download_dir=download_dir,
-        created_from=created_from_dt,
-        created_to=created_to_dt,
-        updated_from=updated_from_dt,
-        updated_to=updated_to_dt,
-        min_attach_kb=args.min_attach_kb,
-        inline_block_hosts=inline_block_hosts,
-        # Octa
-        octa_lookup=octa_lookup_enabled,
-        octa_url=octa_url,
-        octa_key=octa_key,
-        octa_agent_email_hdr=octa_agent_email_hdr,
-        octa_contact_cf_key=octa_contact_cf_key,
-        octa_org_cf_key=octa_org_cf_key,
-        octa_timeout=max(5, int(args.octa_timeout)),
-        # anexos
-        attach_signature_block=not args.no_attach_signature_block,
-    )
+    open_error_log(args.error_log or default_error_log_path())
 
-    log_path = args.error_log or f"./errors_freshdesk_sync_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
-    write_error_csv(log_path)
+    # Run
+    attach_executor = ThreadPoolExecutor(max_workers=max(1, args.attach_workers))
+    try:
+        sync_tickets(
+            domain=fd_domain,
+            api_key=fd_key,
+            db=db,
+            updated_since=args.updated_since,
+            include_inline=include_inline,
+            inline_scrape=inline_scrape,
+            max_mb=args.max_attach_mb,
+            page_size=page_size,
+            ticket_ids=ids if ids else None,
+            download_dir=download_dir,
+            created_from=created_from_dt,
+            created_to=created_to_dt,
+            updated_from=updated_from_dt,
+            updated_to=updated_to_dt,
+            min_attach_kb=args.min_attach_kb,
+            inline_block_hosts=inline_block_hosts,
+            # Octa
+            octa_lookup=octa_lookup_enabled,
+            octa_url=octa_url,
+            octa_key=octa_key,
+            octa_agent_email_hdr=octa_agent_email_hdr,
+            octa_contact_cf_key=octa_contact_cf_key,
+            octa_org_cf_key=octa_org_cf_key,
+            octa_timeout=max(5, int(args.octa_timeout)),
+            # anexos
+            attach_signature_block=not args.no_attach_signature_block,
+            # incremental
+            skip_unchanged=args.skip_unchanged,
+            # paralelismo
+            workers=max(1, args.workers),
+            attach_executor=attach_executor,
+            batch_size=max(1, args.batch_size),
+        )
+    finally:
+        attach_executor.shutdown(wait=True)
+        close_sessions()
+        close_error_log()
 
 if __name__ == "__main__":
     main()
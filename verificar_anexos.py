@@ -16,16 +16,18 @@ from __future__ import annotations
 import argparse
 import logging
 import os
-import re
 import shutil
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, List, Optional, Set, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
 
 try:
     import mysql.connector as mysql
@@ -134,45 +136,53 @@ def fd_base(domain: str) -> str:
         sd = "https://" + sd
     return sd
 
+def new_session() -> requests.Session:
+    """Session com pool de conexões e retentativa automática de falhas de rede/5xx (429 fica com fd_get)."""
+    sess = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504],
+                  allowed_methods=frozenset({"GET", "HEAD"}), raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=retry)
+    sess.mount("https://", adapter)
+    sess.mount("http://", adapter)
+    return sess
+
+# uma Session do módulo: API e downloads reaproveitam as conexões keep-alive (sem novo TLS por chamada)
+_SESSION = new_session()
+
 def fd_get(domain: str, api_key: str, path: str, params: Optional[Dict[str, str]] = None,
            max_retries: int = 5, session: Optional[requests.Session] = None) -> requests.Response:
     url = f"{fd_base(domain)}/api/v2{path}"
-    sess = session or requests.Session()
+    sess = session or _SESSION
     attempt = 0
+    # falhas de rede e 5xx já são retentadas pelo adapter da Session; aqui só o 429
     while True:
-        try:
-            r = sess.get(url, params=params or {}, headers={"Accept": "application/json"},
-                         auth=HTTPBasicAuth(api_key, "X"), timeout=120)
-            if r.status_code == 429:
-                retry_after = r.headers.get("Retry-After")
-                wait = float(retry_after) if retry_after and retry_after.isdigit() else (2 ** attempt)
-                wait = min(wait, 60.0)
-                LOGGER.warning("[429] Rate limit Freshdesk. Aguardando %.1fs...", wait)
-                time.sleep(wait)
-                attempt += 1
-                if attempt > max_retries:
-                    r.raise_for_status()
-                continue
-            r.raise_for_status()
-            return r
-        except requests.RequestException as e:
-            if attempt < max_retries:
-                wait = min(2 ** attempt, 30)
-                LOGGER.warning("Falha de rede em %s: %s. Retentando em %ss...", path, e, wait)
-                time.sleep(wait)
-                attempt += 1
-                continue
-            raise
+        r = sess.get(url, params=params or {}, headers={"Accept": "application/json"},
+                     auth=HTTPBasicAuth(api_key, "X"), timeout=120)
+        if r.status_code == 429:
+            retry_after = r.headers.get("Retry-After")
+            wait = float(retry_after) if retry_after and retry_after.isdigit() else (2 ** attempt)
+            wait = min(wait, 60.0)
+            LOGGER.warning("[429] Rate limit Freshdesk. Aguardando %.1fs...", wait)
+            time.sleep(wait)
+            attempt += 1
+            if attempt > max_retries:
+                r.raise_for_status()
+            continue
+        r.raise_for_status()
+        return r
 
 def fd_get_ticket_full(domain: str, api_key: str, ticket_id: int, session: Optional[requests.Session]=None) -> dict:
     r = fd_get(domain, api_key, f"/tickets/{ticket_id}", params={"include": "conversations"}, session=session)
     return r.json()
 
+# caracteres proibidos em nomes de arquivo (Windows) + controles ASCII -> "_"
+_SAFE_FILENAME_TABLE = str.maketrans({c: "_" for c in '<>:"/\\|?*' + "".join(map(chr, range(0x20)))})
+
 def safe_filename(name: str) -> str:
-    return re.sub(r'[<>:"/\\|?*\x00-\x1F]', "_", name)[:180]
+    return name.translate(_SAFE_FILENAME_TABLE)[:180]
 
 def download_binary(url: str, dest: Path, session: Optional[requests.Session]=None) -> Tuple[bool, int]:
-    sess = session or requests.Session()
+    sess = session or _SESSION
     try:
         with sess.get(url, timeout=120, stream=True) as rr:
             rr.raise_for_status()
@@ -186,21 +196,35 @@ def download_binary(url: str, dest: Path, session: Optional[requests.Session]=No
         LOGGER.warning("Falha ao baixar %s: %s", url, e)
         return False, 0
 
+ATTACH_DOWNLOAD_WORKERS = 8
+
 def download_attachments_for_ticket(ticket_data: dict, ticket_dir: Path, session: Optional[requests.Session]=None) -> int:
-    saved_count = 0
-    def handle_one(name: str, url: str):
-        nonlocal saved_count
-        if not url: return
+    # nome do arquivo -> URL; com nomes repetidos vale o último (como na gravação sequencial),
+    # e cada arquivo tem um único download gravando nele
+    targets: Dict[str, str] = {}
+    all_atts = list(ticket_data.get("attachments") or [])
+    for c in (ticket_data.get("conversations") or []):
+        all_atts.extend(c.get("attachments") or [])
+    for a in all_atts:
+        name, url = a.get("name"), a.get("attachment_url")
+        if not url:
+            continue
         fn = safe_filename(name or url.split("/")[-1].split("?")[0] or "attachment")
+        targets.pop(fn, None)
+        targets[fn] = url
+
+    def handle_one(item: Tuple[str, str]) -> bool:
+        fn, url = item
         ok, size = download_binary(url, ticket_dir / fn, session=session)
         if ok:
-            saved_count += 1
             LOGGER.info("Anexo salvo (%d B) para ticket %s: %s", size, ticket_data.get('id'), fn)
-    for a in (ticket_data.get("attachments") or []):
-        handle_one(a.get("name"), a.get("attachment_url"))
-    for c in (ticket_data.get("conversations") or []):
-        for a in (c.get("attachments") or []):
-            handle_one(a.get("name"), a.get("attachment_url"))
+        return ok
+
+    # downloads independentes: em paralelo, reaproveitando o pool de conexões da Session
+    saved_count = 0
+    if targets:
+        with ThreadPoolExecutor(max_workers=min(ATTACH_DOWNLOAD_WORKERS, len(targets))) as executor:
+            saved_count = sum(executor.map(handle_one, targets.items()))
     if saved_count == 0:
         LOGGER.info("Nenhum anexo encontrado para o ticket %s. Pasta criada.", ticket_data.get('id'))
     return saved_count
@@ -248,7 +272,7 @@ def main():
         LOGGER.info("Nenhum ticket novo para baixar. Sincronização de downloads concluída.")
     else:
         LOGGER.info("Encontrados %d tickets para baixar (presentes no banco, mas sem pasta local).", len(missing_ids))
-        sess = requests.Session()
+        sess = _SESSION
         processed_count, total_attachments_saved = 0, 0
         for tid in sorted(list(missing_ids)):
             try: